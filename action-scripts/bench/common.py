@@ -0,0 +1,18 @@
+import importlib.util
+import os
+import sys
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCH_DIR)
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+DATA_DIR = os.path.join(SCRIPTS_DIR, '..', 'route-data')
+
+sys.path.insert(0, SCRIPTS_DIR)
+
+def load_script(filename):
+    """Import one of the hyphenated action-scripts (e.g. fetch-bus-stop.py) as a module."""
+    name = os.path.splitext(filename)[0].replace('-', '_')
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
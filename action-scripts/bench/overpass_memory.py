@@ -0,0 +1,99 @@
+"""Peak memory of parsing an Overpass response: whole-document json vs streaming.
+
+Each measurement runs in a fresh subprocess and reports the growth of peak RSS
+over the interpreter's baseline. --scale replays the fixture N times with
+shifted ids to stand in for a larger bounding box.
+"""
+import argparse
+import gzip
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from common import FIXTURES_DIR, load_script
+
+FIXTURE_PATH = os.path.join(FIXTURES_DIR, 'overpass-stops-routes.json.gz')
+ID_OFFSET = 10 ** 12
+MODES = ['json', 'stream']
+
+def write_scaled_fixture(fixture_path, scale, output_path):
+    with gzip.open(fixture_path, 'rb') as f:
+        data = json.load(f)
+    elements = data.pop('elements')
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data)[:-1] + ', "elements": [\n')
+        first = True
+        for copy in range(scale):
+            offset = copy * ID_OFFSET
+            for element in elements:
+                element = dict(element, id=element['id'] + offset)
+                if 'members' in element:
+                    element['members'] = [dict(m, ref=m['ref'] + offset) for m in element['members']]
+                f.write(('' if first else ',\n') + json.dumps(element, ensure_ascii=False))
+                first = False
+        f.write('\n]}\n')
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def measure(mode, path):
+    from overpass import iter_file_elements
+    fetch_bus_stop = load_script('fetch-bus-stop.py')
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+
+    with open(path, 'rb') as f:
+        if mode == 'json':
+            # The old json.loads() approach: the whole body, then the whole tree
+            elements = json.loads(f.read())['elements']
+        else:
+            elements = iter_file_elements(f)
+        features, index = fetch_bus_stop.index_stops_and_routes(elements)
+
+    return {
+        'mode': mode,
+        'seconds': round(time.perf_counter() - start, 3),
+        'peak_rss_delta_kb': peak_rss_kb() - baseline,
+        'features': len(features),
+        'nodes': index.node_count,
+        'relations': index.relation_count,
+    }
+
+def run_in_subprocess(mode, path):
+    output = subprocess.check_output([sys.executable, __file__, '--measure', mode, path])
+    return json.loads(output)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--fixture', default=FIXTURE_PATH)
+    parser.add_argument('--scale', default='1,4,16', help="comma-separated replay factors (default: 1,4,16)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--measure', nargs=2, metavar=('MODE', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in (int(s) for s in args.scale.split(',')):
+            path = os.path.join(tmp, f'response-x{scale}.json')
+            write_scaled_fixture(args.fixture, scale, path)
+            size_kb = os.path.getsize(path) // 1024
+            for mode in MODES:
+                result = dict(run_in_subprocess(mode, path), scale=scale, response_kb=size_kb)
+                results.append(result)
+                print(f"x{scale:<4} {size_kb:>8} KB  {mode:<6}  peak +{result['peak_rss_delta_kb']:>8} KB"
+                      f"  {result['seconds']:>7.3f} s  {result['features']} stops")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
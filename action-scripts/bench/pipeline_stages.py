@@ -0,0 +1,215 @@
+"""Time and memory-profile every stage of the data pipeline on recorded fixtures.
+
+Runs fully offline: the Overpass fixture is served through the response cache
+in replay mode, and the route stages use the route sample recorded by
+record_fixture.py. Each stage is timed over --repeat runs (best time kept),
+then run once more under tracemalloc for its peak Python allocation.
+
+  python action-scripts/bench/pipeline_stages.py --output bench.json
+  python action-scripts/bench/pipeline_stages.py --compare bench.json
+"""
+import argparse
+import asyncio
+import copy
+import gzip
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from common import FIXTURES_DIR, SCRIPTS_DIR, load_script
+
+OVERPASS_FIXTURE = os.path.join(FIXTURES_DIR, 'overpass-stops-routes.json.gz')
+ROUTES_FIXTURE = os.path.join(FIXTURES_DIR, 'routes-sample.json.gz')
+
+class BenchContext:
+    """Fixtures unpacked into a scratch directory, plus what each stage hands the next."""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+        self.cache_dir = os.path.join(workdir, 'overpass-cache')
+        self.route_data_dir = os.path.join(workdir, 'geojson')
+        self.routes_json_path = os.path.join(workdir, 'routes.json')
+        self.fetch_bus_stop = load_script('fetch-bus-stop.py')
+        self.features = None
+        self.index = None
+
+    def prepare(self):
+        from overpass_cache import OverpassCache
+        with gzip.open(OVERPASS_FIXTURE, 'rb') as f:
+            body = f.read()
+        self.stop_nodes = [e for e in json.loads(body)['elements'] if self.fetch_bus_stop.is_bus_stop(e)]
+        cache = OverpassCache(self.cache_dir, mode='use')
+        entry = cache.open_entry(self.fetch_bus_stop.stops_and_routes_query())
+        entry.write(body)
+        entry.commit({})
+        os.environ['OVERPASS_CACHE'] = 'replay'
+        os.environ['OVERPASS_CACHE_DIR'] = self.cache_dir
+
+        with gzip.open(ROUTES_FIXTURE, 'rt', encoding='utf-8') as f:
+            sample = json.load(f)
+        self.routes_data = sample['routes']
+        with open(self.routes_json_path, 'w') as f:
+            json.dump(self.routes_data, f, indent=2)
+        for relation_id, files in sample['files'].items():
+            route_dir = os.path.join(self.route_data_dir, relation_id)
+            os.makedirs(route_dir, exist_ok=True)
+            for filename, data in files.items():
+                # Same layout update-routes.js writes
+                with open(os.path.join(route_dir, filename), 'w') as f:
+                    json.dump(data, f, indent=2)
+        self.route_count = len(sample['files'])
+
+        features, index = asyncio.run(self.fetch_bus_stop.fetch_stops_and_routes())
+        self.features, self.index = features, index
+
+    def output_dir(self, name):
+        path = os.path.join(self.workdir, 'out', name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+def stage_fetch_parse(ctx):
+    features, index = asyncio.run(ctx.fetch_bus_stop.fetch_stops_and_routes())
+    return index.node_count + index.relation_count
+
+def stage_feature_build(ctx):
+    return len([ctx.fetch_bus_stop.build_stop_feature(node) for node in ctx.stop_nodes])
+
+def stage_route_matching(ctx):
+    features = copy.deepcopy(ctx.features)
+    ctx.fetch_bus_stop.match_routes(features, ctx.index)
+    ctx.fetch_bus_stop.add_proximity_routes(features, ctx.routes_data, ctx.route_data_dir)
+    ctx.matched = features
+    return len(features)
+
+def stage_json_dump(ctx):
+    from geojson_writer import PROFILES, write_geojson
+    features = getattr(ctx, 'matched', ctx.features)
+    path = os.path.join(ctx.output_dir('bus-stop'), 'all_bus_stops.geojson')
+    write_geojson(path, {'type': 'FeatureCollection', 'features': features}, PROFILES['compact'], layer='stops')
+    return len(features)
+
+def run_writers(ctx, writers):
+    from route_pipeline import run
+    manifest_path = os.path.join(ctx.workdir, 'manifest.json')
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+    errors = run(writers, ctx.routes_json_path, ctx.route_data_dir, manifest_path, force=True, jobs=1)
+    if errors:
+        raise RuntimeError(f"{len(errors)} route(s) failed: {errors[0]}")
+    return ctx.route_count
+
+def stage_kml_save(ctx):
+    from kml_writer import KmlWriter
+    return run_writers(ctx, [KmlWriter(ctx.output_dir('kml-named'))])
+
+def stage_shp_write(ctx):
+    from shp_writer import ShpWriter, UngroupedShpWriter
+    return run_writers(ctx, [
+        ShpWriter(ctx.output_dir('shp-named')),
+        UngroupedShpWriter(ctx.output_dir('shp-named-ungrouped')),
+    ])
+
+def stage_zip(ctx):
+    # The route GeoJSON rather than the KML/SHP output, so the stage doesn't depend on which ran before
+    names = sorted(
+        os.path.join(relation_id, filename)
+        for relation_id in os.listdir(ctx.route_data_dir)
+        for filename in os.listdir(os.path.join(ctx.route_data_dir, relation_id))
+    )
+    with zipfile.ZipFile(os.path.join(ctx.workdir, 'bundle.zip'), 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in names:
+            archive.write(os.path.join(ctx.route_data_dir, name), name)
+    return len(names)
+
+# In pipeline order; later stages use what earlier ones produced
+STAGES = [
+    ('fetch_parse', stage_fetch_parse),
+    ('feature_build', stage_feature_build),
+    ('route_matching', stage_route_matching),
+    ('json_dump', stage_json_dump),
+    ('kml_save', stage_kml_save),
+    ('shp_write', stage_shp_write),
+    ('zip', stage_zip),
+]
+
+def measure(ctx, name, stage, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = stage(ctx)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    stage(ctx)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'stage': name,
+        'seconds': round(min(times), 4),
+        'seconds_all': [round(t, 4) for t in times],
+        'peak_alloc_kb': peak // 1024,
+        'items': items,
+    }
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=SCRIPTS_DIR, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    with open(baseline_path, 'r') as f:
+        baseline = {stage['stage']: stage for stage in json.load(f)['stages']}
+    print(f"{'stage':<16} {'before':>9} {'after':>9} {'change':>8}")
+    for stage in results['stages']:
+        before = baseline.get(stage['stage'])
+        if not before or not before['seconds']:
+            continue
+        change = (stage['seconds'] / before['seconds'] - 1) * 100
+        print(f"{stage['stage']:<16} {before['seconds']:>8.3f}s {stage['seconds']:>8.3f}s {change:>+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', default=','.join(name for name, _ in STAGES),
+                        help="comma-separated stages to run (default: all)")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per stage (default: 3)")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', metavar='JSON', help="print the change against an earlier --output file")
+    args = parser.parse_args()
+
+    selected = set(args.stages.split(','))
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'stages': [],
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = BenchContext(workdir)
+        ctx.prepare()
+        for name, stage in STAGES:
+            if name not in selected:
+                continue
+            try:
+                result = measure(ctx, name, stage, args.repeat)
+            except ImportError as e:
+                # e.g. geopandas missing for the SHP stage
+                print(f"{name:<16} skipped: {e}")
+                continue
+            results['stages'].append(result)
+            print(f"{name:<16} {result['seconds']:>8.3f} s  peak {result['peak_alloc_kb']:>8} KB  {result['items']} items")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == '__main__':
+    main()
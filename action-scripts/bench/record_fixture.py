@@ -0,0 +1,117 @@
+import argparse
+import gzip
+import json
+import os
+from common import DATA_DIR, FIXTURES_DIR, load_script
+
+FIXTURE_PATH = os.path.join(FIXTURES_DIR, 'overpass-stops-routes.json.gz')
+ROUTES_FIXTURE_PATH = os.path.join(FIXTURES_DIR, 'routes-sample.json.gz')
+
+def save_fixture(path, raw):
+    # Fixed mtime so re-recording identical data gives an identical file
+    with open(path, 'wb') as f:
+        f.write(gzip.compress(raw, mtime=0))
+
+def record_live(path):
+    """Save the raw response of fetch-bus-stop.py's Overpass query."""
+    from overpass import post_overpass
+    fetch_bus_stop = load_script('fetch-bus-stop.py')
+    response = post_overpass(fetch_bus_stop.stops_and_routes_query())
+    save_fixture(path, response.content)
+
+def category_tags(category):
+    """shelter/pole tags that give the same category, for stops written without them."""
+    tags = {}
+    if 'shelter_yes' in category:
+        tags['shelter'] = 'yes'
+    for pole in ('sign', 'totem', 'flag'):
+        if f'pole_{pole}' in category:
+            tags['pole'] = 'traffic_sign' if pole == 'sign' else pole
+    return tags
+
+def synthesize(path):
+    """Rebuild an equivalent Overpass response offline from the committed route-data.
+
+    Stops come from all_bus_stops.geojson, relations from the stops' routes and
+    their ways from route-data/geojson, so sizes and shapes match the real query.
+    """
+    with open(os.path.join(DATA_DIR, 'bus-stop', 'all_bus_stops.geojson'), encoding='utf-8') as f:
+        stops = json.load(f)['features']
+
+    nodes = {}
+    relation_members = {}
+    for stop in stops:
+        props = stop['properties']
+        tags = {'highway': 'bus_stop', 'public_transport': 'platform'}
+        for key in ('name', 'shelter', 'pole', 'lit', 'bench', 'bin'):
+            if props.get(key) is not None:
+                tags[key] = props[key]
+        tags.update(category_tags(props.get('category') or ''))
+        lon, lat = stop['geometry']['coordinates']
+        nodes[props['id']] = {'type': 'node', 'id': props['id'], 'lat': lat, 'lon': lon, 'tags': tags}
+        for relation_id in props['routes']:
+            relation_members.setdefault(relation_id, []).append(
+                {'type': 'node', 'ref': props['id'], 'role': 'platform'})
+
+    relations = []
+    for relation_id in sorted(relation_members):
+        members = relation_members[relation_id]
+        ways_path = os.path.join(DATA_DIR, 'geojson', str(relation_id), 'ways.geojson')
+        if os.path.exists(ways_path):
+            with open(ways_path, encoding='utf-8') as f:
+                members = members + [
+                    {'type': 'way', 'ref': way['properties']['id'], 'role': ''}
+                    for way in json.load(f)['features']
+                ]
+        relations.append({
+            'type': 'relation',
+            'id': relation_id,
+            'members': members,
+            'tags': {'type': 'route', 'route': 'bus'},
+        })
+
+    response = {
+        'version': 0.6,
+        'generator': 'Overpass API (synthesized from route-data)',
+        'osm3s': {'timestamp_osm_base': '', 'copyright': 'OpenStreetMap contributors, ODbL 1.0'},
+        'elements': [nodes[node_id] for node_id in sorted(nodes)] + relations,
+    }
+    save_fixture(path, json.dumps(response, ensure_ascii=False, indent=1).encode('utf-8'))
+
+def record_routes(path):
+    """Save the first route of every routes.json category with its GeoJSON files."""
+    from route_pipeline import load_route_files, load_routes
+    routes_data = load_routes()
+    categories = []
+    files = {}
+    for category in routes_data['categories']:
+        for route in category['routes']:
+            route_dir = os.path.join(DATA_DIR, 'geojson', route['relationId'])
+            if os.path.exists(route_dir):
+                categories.append(dict(category, routes=[route]))
+                files[route['relationId']] = dict(load_route_files(route_dir))
+                break
+
+    sample = {'routes': {'categories': categories}, 'files': files}
+    save_fixture(path, json.dumps(sample, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Record the Overpass and route fixtures used by the benchmarks")
+    parser.add_argument('--live', action='store_true', help="query Overpass instead of synthesizing from route-data")
+    parser.add_argument('--output', default=FIXTURE_PATH)
+    parser.add_argument('--routes-output', default=ROUTES_FIXTURE_PATH,
+                        help="where to save the sample of route-data/geojson")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    if args.live:
+        record_live(args.output)
+    else:
+        synthesize(args.output)
+    print(f"Saved fixture to {args.output}")
+
+    record_routes(args.routes_output)
+    print(f"Saved route sample to {args.routes_output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Invert every route's ways.geojson into one deduplicated road network.
+
+Many routes run over the same OSM ways. This stage stores each way once and
+records which routes use it:
+
+  route-data/network/way-routes.json   way id -> relation ids, in routes.json order
+  route-data/network/network.geojson   one LineString per way with routes,
+                                       route_count and the routes' colours
+
+route_count is the corridor frequency: how many routes share that stretch of
+road. When the same way was fetched with different geometry for different
+routes (files refreshed at different times), the first route's copy is kept
+and the mismatch is counted in the summary.
+"""
+import json
+import os
+from geojson_writer import PROFILES, write_geojson
+from route_pipeline import DATA_DIR, ROUTE_DATA_DIR, iter_routes, load_routes
+
+OUTPUT_DIR = os.path.join(DATA_DIR, 'network')
+
+def load_ways(route_dir):
+    path = os.path.join(route_dir, 'ways.geojson')
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [
+            feature for feature in json.load(f)['features']
+            if feature['geometry'] and feature['geometry']['type'] == 'LineString'
+            and feature['properties'].get('id') is not None
+        ]
+
+def build_network(routes_data, route_data_dir=ROUTE_DATA_DIR):
+    """Return ({way id: feature}, {way id: [relation ids]}, {relation id: colour}, mismatched way ids)."""
+    ways = {}
+    way_routes = {}
+    colors = {}
+    mismatched = set()
+    for category, route in iter_routes(routes_data):
+        relation_id = int(route['relationId'])
+        if relation_id in colors:
+            continue
+        colors[relation_id] = route['color']
+        for feature in load_ways(os.path.join(route_data_dir, route['relationId'])):
+            way_id = feature['properties']['id']
+            if way_id not in ways:
+                ways[way_id] = feature
+            elif ways[way_id]['geometry']['coordinates'] != feature['geometry']['coordinates']:
+                mismatched.add(way_id)
+            routes = way_routes.setdefault(way_id, [])
+            # A route can list the same way twice (e.g. both directions of a loop)
+            if relation_id not in routes:
+                routes.append(relation_id)
+    return ways, way_routes, colors, mismatched
+
+def network_features(ways, way_routes, colors):
+    features = []
+    for way_id in sorted(ways):
+        props = ways[way_id]['properties']
+        routes = way_routes[way_id]
+        features.append({
+            'type': 'Feature',
+            'geometry': ways[way_id]['geometry'],
+            'properties': {
+                'id': way_id,
+                'name': props.get('name'),
+                'highway': props.get('highway'),
+                'routes': routes,
+                'route_count': len(routes),
+                'colors': sorted({colors[r] for r in routes}),
+            },
+        })
+    return features
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    ways, way_routes, colors, mismatched = build_network(load_routes())
+
+    with open(os.path.join(OUTPUT_DIR, 'way-routes.json'), 'w') as f:
+        json.dump({str(way_id): way_routes[way_id] for way_id in sorted(way_routes)}, f, separators=(',', ':'))
+    features = network_features(ways, way_routes, colors)
+    size = write_geojson(os.path.join(OUTPUT_DIR, 'network.geojson'),
+                         {'type': 'FeatureCollection', 'features': features}, PROFILES['compact'], layer='network')
+
+    per_route = sum(len(routes) for routes in way_routes.values())
+    shared = [f for f in features if f['properties']['route_count'] > 1]
+    print(f"Network: {len(ways)} ways ({per_route} as stored per route), {len(shared)} shared by 2+ routes, "
+          f"{size / 1024:.0f} KB")
+    if mismatched:
+        print(f"  {len(mismatched)} ways differ between routes' files; kept the first copy")
+    print("Busiest corridors:")
+    for feature in sorted(shared, key=lambda f: -f['properties']['route_count'])[:10]:
+        props = feature['properties']
+        print(f"  {props['route_count']:>3} routes  way {props['id']} {props['name'] or ''}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Build route-data/search/search-index.json, a small prebuilt index for finding stops and routes.
+
+The site can look up a stop or route with one probe into this file instead of
+loading all_bus_stops.geojson and routes.json and scanning them. Layout:
+
+  categories  category names in routes.json order
+  routes      [relationId, name, ref, destination, color, text color, category index]
+              in routes.json order; ref and destination are worked out the way
+              bus-stop-display.js does for its badges
+  stops       [id, name, lon, lat, route indices, unknown relationIds]; the
+              route indices are the stop's badges, in routes.json order
+  docs        routes are documents 0..len(routes)-1, stops follow
+  terms       sorted normalized tokens (lower case, accents removed);
+              a prefix query is a binary search for the first term >= prefix
+  postings    per term, the sorted document numbers containing it
+  trigrams    trigram -> term numbers, for substring and typo-tolerant lookups
+
+Route documents are indexed on name, ref and destination (the text after →),
+stop documents on their name.
+"""
+import bisect
+import json
+import os
+import re
+import unicodedata
+from route_pipeline import DATA_DIR, iter_routes, load_routes
+
+STOPS_PATH = os.path.join(DATA_DIR, 'bus-stop', 'all_bus_stops.geojson')
+OUTPUT_DIR = os.path.join(DATA_DIR, 'search')
+FORMAT_VERSION = 1
+TOKEN = re.compile(r'[0-9a-z]+')
+REF_FROM_NAME = re.compile(r'^(?:Koridor|Corridor|Rute|Route)?\s*(\w+)', re.IGNORECASE)
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+def tokens(*texts):
+    found = set()
+    for text in texts:
+        found.update(TOKEN.findall(normalize(text)))
+    return found
+
+def trigrams(term):
+    # Padded so short terms and word starts get trigrams too
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+# Same rules as extractDestination() and the badge code in bus-stop-display.js
+def route_destination(name):
+    if '→' in name:
+        return re.sub(r'[.,;:]$', '', name[name.index('→') + 1:].strip()).strip()
+    if ':' in name:
+        return name[name.index(':') + 1:].strip()
+    return name
+
+def route_ref(route):
+    if route.get('ref'):
+        return route['ref']
+    match = REF_FROM_NAME.match(route.get('name') or '')
+    return match.group(1) if match else ''
+
+def contrast_color(hex_color):
+    if not hex_color or not hex_color.startswith('#') or len(hex_color) != 7:
+        return '#FFFFFF'
+    try:
+        r, g, b = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    except ValueError:
+        return '#FFFFFF'
+    return '#000000' if (0.299 * r + 0.587 * g + 0.114 * b) / 255 > 0.6 else '#FFFFFF'
+
+def build_index(routes_data, stops):
+    categories = []
+    routes = []
+    route_index = {}
+    texts = []
+    for category, route in iter_routes(routes_data):
+        if route['relationId'] in route_index:
+            continue
+        if not categories or categories[-1] != category['name']:
+            categories.append(category['name'])
+        ref, destination = route_ref(route), route_destination(route['name'])
+        route_index[route['relationId']] = len(routes)
+        routes.append([int(route['relationId']), route['name'], ref, destination, route['color'],
+                       contrast_color(route['color']), len(categories) - 1])
+        texts.append(tokens(route['name'], ref, destination))
+
+    stop_rows = []
+    for stop in sorted(stops, key=lambda stop: stop['properties']['id']):
+        props = stop['properties']
+        lon, lat = stop['geometry']['coordinates'][:2]
+        relation_ids = [str(r) for r in props.get('routes') or []]
+        badges = sorted(route_index[r] for r in relation_ids if r in route_index)
+        unknown = [int(r) for r in relation_ids if r not in route_index]
+        stop_rows.append([props['id'], props.get('name') or '', round(lon, 6), round(lat, 6), badges, unknown])
+        texts.append(tokens(props.get('name')))
+
+    postings = {}
+    for doc, doc_terms in enumerate(texts):
+        for term in doc_terms:
+            postings.setdefault(term, []).append(doc)
+    terms = sorted(postings)
+    trigram_terms = {}
+    for number, term in enumerate(terms):
+        for trigram in trigrams(term):
+            trigram_terms.setdefault(trigram, []).append(number)
+
+    return {
+        'format': FORMAT_VERSION,
+        'categories': categories,
+        'routes': routes,
+        'stops': stop_rows,
+        'terms': terms,
+        'postings': [postings[term] for term in terms],
+        'trigrams': dict(sorted(trigram_terms.items())),
+    }
+
+def search(index, query, limit=10):
+    """Reference lookup: documents matching every query word as a prefix.
+
+    Words without a prefix match fall back to trigram overlap, which also
+    catches small typos. Returns ('route' | 'stop', row) pairs.
+    """
+    terms = index['terms']
+    matched = None
+    for word in TOKEN.findall(normalize(query)):
+        start = bisect.bisect_left(terms, word)
+        numbers = []
+        while start < len(terms) and terms[start].startswith(word):
+            numbers.append(start)
+            start += 1
+        if not numbers:
+            counts = {}
+            for trigram in trigrams(word):
+                for number in index['trigrams'].get(trigram, []):
+                    counts[number] = counts.get(number, 0) + 1
+            best = max(counts.values(), default=0)
+            numbers = [number for number, count in counts.items() if count == best and count >= 2]
+        docs = {doc for number in numbers for doc in index['postings'][number]}
+        matched = docs if matched is None else matched & docs
+    route_count = len(index['routes'])
+    # Routes first, then stops, each in file order
+    return [
+        ('route', index['routes'][doc]) if doc < route_count else ('stop', index['stops'][doc - route_count])
+        for doc in sorted(matched or [])[:limit]
+    ]
+
+def main():
+    with open(STOPS_PATH, 'r', encoding='utf-8') as f:
+        stops = json.load(f)['features']
+    index = build_index(load_routes(), stops)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(OUTPUT_DIR, 'search-index.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+    source_bytes = os.path.getsize(STOPS_PATH) + os.path.getsize(os.path.join(DATA_DIR, 'routes.json'))
+    print(f"Search index: {len(index['routes'])} routes, {len(index['stops'])} stops, {len(index['terms'])} terms, "
+          f"{os.path.getsize(path) / 1024:.0f} KB (stops + routes.json: {source_bytes / 1024:.0f} KB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Write each route's stops in travel order with their distance along the route.
+
+all_bus_stops.geojson only says which routes serve a stop, and a route's
+stops.geojson is in node id order. This stage projects the stops onto the
+stitched route line (the same ordering the transfer graph uses) and writes
+route-data/stop-sequences/<relationId>.json:
+
+  relationId, name, length_m   the route and the length of its stitched line
+  stops                        [id, name, chainage_m, offset_m, next_m] in travel order
+
+chainage_m is the distance from the start of the route, offset_m how far the
+stop sits from the line and next_m the distance to the next stop (null for the
+last one). So "next stops" lists and travel distances between two stops are a
+lookup and a subtraction, with no geometry work in the browser.
+
+Stops more than MAX_STOP_OFFSET from the line are left out, as in the graph.
+"""
+import json
+import os
+import time
+from metrics import run_metrics
+from route_pipeline import DATA_DIR, load_routes
+from transit_graph import load_stops, route_sequences
+
+OUTPUT_DIR = os.path.join(DATA_DIR, 'stop-sequences')
+
+def sequence_document(route, stops, sequence, along, offsets, length):
+    rows = []
+    for k, stop in enumerate(sequence):
+        props = stops[stop]['properties']
+        next_m = round(along[k + 1] - along[k]) if k + 1 < len(sequence) else None
+        rows.append([props['id'], props.get('name') or '', round(along[k]), round(offsets[k]), next_m])
+    return {
+        'relationId': route['relationId'],
+        'name': route['name'],
+        'length_m': round(length),
+        'stops': rows,
+    }
+
+def write_if_changed(path, text):
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return False
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return True
+
+def main():
+    start_time = time.time()
+    with run_metrics.stage('project'):
+        stops, _, sequences = route_sequences(load_routes(), load_stops())
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    written = set()
+    changed = 0
+    stop_count = 0
+    with run_metrics.stage('write'):
+        for category, route, sequence, along, offsets, length in sequences:
+            filename = f"{route['relationId']}.json"
+            if not sequence or filename in written:
+                continue
+            document = sequence_document(route, stops, sequence, along, offsets, length)
+            text = json.dumps(document, ensure_ascii=False, separators=(',', ':')) + '\n'
+            changed += write_if_changed(os.path.join(OUTPUT_DIR, filename), text)
+            written.add(filename)
+            stop_count += len(sequence)
+        # Routes that left routes.json or lost all their stops
+        for filename in os.listdir(OUTPUT_DIR):
+            if filename[:-len('.json')].isdigit() and filename not in written:
+                os.remove(os.path.join(OUTPUT_DIR, filename))
+    run_metrics.count('files_written', changed)
+    run_metrics.write(OUTPUT_DIR)
+
+    print(f"Stop sequences: {len(written)} routes, {stop_count} route stops, {changed} files changed "
+          f"in {time.time() - start_time:.1f} s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Build route-data/tiles/transit.pmtiles from the route tile fragments and the bus stops.
+
+Run convert-geojson.py (format "tiles") first: it cuts every changed route
+into route-data/tile-fragments. This script merges those pieces per tile,
+adds the stops, encodes Mapbox Vector Tiles in a process pool and writes one
+PMTiles archive that the map can read tile by tile with HTTP Range requests.
+
+Layers:
+  routes  relationId, name, ref, color, category
+  stops   id, name, category, route_count, routes (comma-separated relation ids)
+"""
+import argparse
+import gzip
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import mapbox_vector_tile
+from metrics import run_metrics
+from pmtiles.tile import Compression, TileType, zxy_to_tileid
+from pmtiles.writer import Writer
+from route_pipeline import DATA_DIR, iter_routes, load_routes
+from tile_writer import EXTENT, MAX_ZOOM, MIN_ZOOM, tile_at, tile_origin, tile_size, to_mercator
+
+FRAGMENTS_DIR = os.path.join(DATA_DIR, 'tile-fragments')
+STOPS_PATH = os.path.join(DATA_DIR, 'bus-stop', 'all_bus_stops.geojson')
+OUTPUT_PATH = os.path.join(DATA_DIR, 'tiles', 'transit.pmtiles')
+# Below this zoom the stops are just clutter
+STOPS_MIN_ZOOM = 13
+
+def load_route_fragments(tiles, routes_data, fragments_dir):
+    bounds = [float('inf'), float('inf'), float('-inf'), float('-inf')]
+    count = 0
+    for category, route in iter_routes(routes_data):
+        path = os.path.join(fragments_dir, f"{route['relationId']}.json")
+        if not os.path.exists(path):
+            print(f"No tile fragments for {route['name']}, run convert-geojson.py --formats tiles")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            fragment = json.load(f)
+        for key, lines in fragment['tiles'].items():
+            z, x, y = map(int, key.split('/'))
+            tiles[(z, x, y)]['routes'].append((lines, fragment['properties']))
+        count += 1
+    return count
+
+def add_stops(tiles, stops, min_zoom, max_zoom):
+    if not stops:
+        return
+    points = to_mercator([stop['geometry']['coordinates'] for stop in stops])
+    for z in range(max(min_zoom, STOPS_MIN_ZOOM), max_zoom + 1):
+        scale = EXTENT / tile_size(z)
+        for stop, (mx, my) in zip(stops, points):
+            x, y = tile_at(z, mx, my)
+            left, top = tile_origin(z, x, y)
+            props = stop['properties']
+            tiles[(z, x, y)]['stops'].append(([round((mx - left) * scale), round((top - my) * scale)], {
+                'id': props['id'],
+                'name': props.get('name') or '',
+                'category': props.get('category') or '',
+                'route_count': len(props.get('routes') or []),
+                'routes': ','.join(str(r) for r in props.get('routes') or []),
+            }))
+
+def encode_tile(layers):
+    """Encode one tile's {'routes': [...], 'stops': [...]} as gzipped MVT."""
+    encoded = []
+    if layers['routes']:
+        encoded.append({'name': 'routes', 'features': [
+            {'geometry': {'type': 'MultiLineString', 'coordinates': lines}, 'properties': props}
+            for lines, props in layers['routes']
+        ]})
+    if layers['stops']:
+        encoded.append({'name': 'stops', 'features': [
+            {'geometry': {'type': 'Point', 'coordinates': point}, 'properties': props}
+            for point, props in layers['stops']
+        ]})
+    # Coordinates are already in tile units with y pointing down
+    data = mapbox_vector_tile.encode(encoded, default_options={'y_coord_down': True, 'extents': EXTENT})
+    return gzip.compress(data, mtime=0)
+
+def archive_header(stops, min_zoom, max_zoom):
+    lons = [stop['geometry']['coordinates'][0] for stop in stops] or [107.6]
+    lats = [stop['geometry']['coordinates'][1] for stop in stops] or [-6.9]
+    return {
+        'tile_type': TileType.MVT,
+        'tile_compression': Compression.GZIP,
+        'min_zoom': min_zoom,
+        'max_zoom': max_zoom,
+        'min_lon_e7': int(min(lons) * 10000000),
+        'min_lat_e7': int(min(lats) * 10000000),
+        'max_lon_e7': int(max(lons) * 10000000),
+        'max_lat_e7': int(max(lats) * 10000000),
+        'center_zoom': 12,
+    }
+
+def archive_metadata(min_zoom, max_zoom):
+    return {
+        'name': 'Transport for Bandung',
+        'attribution': '© OpenStreetMap contributors',
+        'vector_layers': [
+            {'id': 'routes', 'minzoom': min_zoom, 'maxzoom': max_zoom, 'fields': {
+                'relationId': 'Number', 'name': 'String', 'ref': 'String', 'color': 'String', 'category': 'String',
+            }},
+            {'id': 'stops', 'minzoom': max(min_zoom, STOPS_MIN_ZOOM), 'maxzoom': max_zoom, 'fields': {
+                'id': 'Number', 'name': 'String', 'category': 'String', 'route_count': 'Number', 'routes': 'String',
+            }},
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the PMTiles archive of routes and bus stops")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: number of CPU cores)")
+    parser.add_argument('--output', default=OUTPUT_PATH, help=f"archive to write (default: {OUTPUT_PATH})")
+    args = parser.parse_args()
+
+    tiles = defaultdict(lambda: {'routes': [], 'stops': []})
+    with run_metrics.stage('merge'):
+        route_count = load_route_fragments(tiles, load_routes(), FRAGMENTS_DIR)
+        with open(STOPS_PATH, 'r', encoding='utf-8') as f:
+            stops = json.load(f)['features']
+        add_stops(tiles, stops, MIN_ZOOM, MAX_ZOOM)
+
+    # PMTiles wants the tiles in tile id order
+    keys = sorted(tiles, key=lambda key: zxy_to_tileid(*key))
+    layers = [tiles[key] for key in keys]
+    with run_metrics.stage('encode'):
+        if args.jobs > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+                encoded = list(executor.map(encode_tile, layers, chunksize=64))
+        else:
+            encoded = [encode_tile(tile) for tile in layers]
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with run_metrics.stage('write'):
+        with open(args.output, 'wb') as f:
+            writer = Writer(f)
+            for key, data in zip(keys, encoded):
+                writer.write_tile(zxy_to_tileid(*key), data)
+            writer.finalize(archive_header(stops, MIN_ZOOM, MAX_ZOOM), archive_metadata(MIN_ZOOM, MAX_ZOOM))
+    run_metrics.count('files_written')
+    run_metrics.write(os.path.dirname(args.output))
+
+    print(f"Wrote {len(keys)} tiles for {route_count} routes and {len(stops)} stops to {args.output} "
+          f"({os.path.getsize(args.output) / 1024:.0f} KB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+"""Compile route-data into the journey planner's transfer graph (transit-graph/graph.npz)."""
+import os
+import time
+from metrics import run_metrics
+from route_pipeline import load_routes
+from transit_graph import GRAPH_PATH, compile_graph, load_stops, save_graph
+
+def main():
+    start_time = time.time()
+    with run_metrics.stage('compile'):
+        graph = compile_graph(load_routes(), load_stops())
+    with run_metrics.stage('save'):
+        save_graph(graph)
+    run_metrics.write(os.path.dirname(GRAPH_PATH))
+
+    stop_count = len(graph['stop_ids'])
+    print(f"Transfer graph: {stop_count} stops, {len(graph['route_ids'])} routes, "
+          f"{len(graph['node_stop']) - stop_count} route stops, {len(graph['indices'])} edges")
+    print(f"Saved {GRAPH_PATH} ({os.path.getsize(GRAPH_PATH) / 1024:.0f} KB) in {time.time() - start_time:.1f} s")
+
+if __name__ == '__main__':
+    main()
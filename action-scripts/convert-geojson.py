@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+from metrics import run_metrics
+from route_pipeline import DATA_DIR, run
+
+FORMATS = ['kml', 'shp', 'shp-ungrouped', 'lod', 'tiles']
+# Written only when asked for with --formats
+EXTRA_FORMATS = ['kmz']
+
+# Writers are imported lazily so a KML-only run doesn't need geopandas
+def make_writer(fmt):
+    if fmt == 'kml':
+        from kml_writer import KmlWriter
+        return KmlWriter(os.path.join(DATA_DIR, 'kml-named'))
+    if fmt == 'kmz':
+        from kml_writer import KmlWriter
+        return KmlWriter(os.path.join(DATA_DIR, 'kmz-named'), kmz=True)
+    if fmt == 'shp':
+        from shp_writer import ShpWriter
+        return ShpWriter(os.path.join(DATA_DIR, 'shp-named'))
+    if fmt == 'shp-ungrouped':
+        from shp_writer import UngroupedShpWriter
+        return UngroupedShpWriter(os.path.join(DATA_DIR, 'shp-named-ungrouped'))
+    if fmt == 'lod':
+        from lod_writer import LodWriter
+        return LodWriter(os.path.join(DATA_DIR, 'geojson-lod'))
+    if fmt == 'tiles':
+        from tile_writer import TileFragmentWriter
+        return TileFragmentWriter(os.path.join(DATA_DIR, 'tile-fragments'))
+    raise ValueError(f"Unknown format: {fmt}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert route-data/geojson into KML, SHP and simplified GeoJSON in one pass")
+    parser.add_argument('--formats', default=','.join(FORMATS),
+                        help=f"comma-separated list of outputs to write (default: {','.join(FORMATS)}; "
+                             f"also available: {','.join(EXTRA_FORMATS)})")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild every route even if its inputs are unchanged")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: number of CPU cores)")
+    args = parser.parse_args()
+
+    writers = [make_writer(fmt.strip()) for fmt in args.formats.split(',') if fmt.strip()]
+    with run_metrics.stage('convert'):
+        errors = run(writers, force=args.force, jobs=args.jobs)
+    for writer in writers:
+        if hasattr(writer, 'report'):
+            writer.report()
+    run_metrics.write(DATA_DIR)
+    if errors:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Export every route and its stops into one GeoPackage and one GeoParquet file.
+
+The per-route shapefile folders are convenient for opening a single route;
+these two files hold the whole network for loading in one read:
+
+  route-data/tfb-routes.gpkg      layers "routes" (lines) and "stops" (points)
+  route-data/tfb-routes.parquet   both, told apart by the feature_type column
+
+Every row carries relationId, route_name, ref, color and category. Stops
+are the route's own stops and endstops, so a stop served by several routes
+appears once per route. Both files are written in bulk from one GeoDataFrame
+sorted along a Hilbert curve; the GeoPackage gets an R-tree and the GeoParquet
+a bbox covering column so readers can filter by area without a full scan.
+"""
+import argparse
+import os
+import time
+import geopandas as gpd
+from route_pipeline import DATA_DIR, iter_routes, load_route, load_routes
+from stitch import chains_geometry
+
+GPKG_PATH = os.path.join(DATA_DIR, 'tfb-routes.gpkg')
+PARQUET_PATH = os.path.join(DATA_DIR, 'tfb-routes.parquet')
+COLUMNS = ['feature_type', 'relationId', 'route_name', 'ref', 'color', 'category', 'name', 'stop_role']
+# GeoPackage stamps its tables with the current time; pin it so unchanged data gives the same file
+GPKG_TIMESTAMP = '2000-01-01T00:00:00Z'
+
+def route_rows(route):
+    common = {
+        'relationId': int(route.relation_id),
+        'route_name': route.name,
+        'ref': route.route.get('ref') or '',
+        'color': f"#{route.color.lstrip('#').upper()}",
+        'category': route.category,
+    }
+    chains, gaps = route.stitched
+    if chains:
+        yield {'type': 'Feature', 'geometry': chains_geometry(chains), 'properties': {
+            'feature_type': 'route', **common, 'name': None, 'stop_role': None,
+        }}
+    for filename, data in route.files:
+        role = filename[:-len('.geojson')]
+        for feature in data.get('features', []):
+            if feature['geometry']['type'] != 'Point':
+                continue
+            yield {'type': 'Feature', 'geometry': feature['geometry'], 'properties': {
+                'feature_type': 'stop', **common, 'name': feature['properties'].get('name'), 'stop_role': role,
+            }}
+
+def build_frame(routes_data):
+    features = []
+    for category, route in iter_routes(routes_data):
+        route_data = load_route(category, route)
+        if route_data is not None:
+            features.extend(route_rows(route_data))
+    gdf = gpd.GeoDataFrame.from_features(features, crs='EPSG:4326', columns=COLUMNS + ['geometry'])
+    gdf['relationId'] = gdf['relationId'].astype('int64')
+    # Nearby rows end up next to each other, which keeps the spatial index and row groups tight
+    gdf['_order'] = gdf.geometry.hilbert_distance()
+    gdf = gdf.sort_values(['feature_type', '_order', 'relationId'], kind='stable').drop(columns='_order')
+    return gdf.reset_index(drop=True)
+
+def write_gpkg(gdf, path):
+    if os.path.exists(path):
+        os.remove(path)
+    os.environ.setdefault('OGR_CURRENT_DATE', GPKG_TIMESTAMP)
+    for feature_type, layer in (('route', 'routes'), ('stop', 'stops')):
+        part = gdf[gdf['feature_type'] == feature_type].drop(columns='feature_type')
+        part.to_file(path, layer=layer, driver='GPKG', engine='pyogrio', SPATIAL_INDEX='YES')
+
+def write_parquet(gdf, path):
+    gdf.to_parquet(path, index=False, compression='zstd', write_covering_bbox=True, schema_version='1.1.0')
+
+def main():
+    parser = argparse.ArgumentParser(description="Export all routes and stops as one GeoPackage and one GeoParquet file")
+    parser.add_argument('--gpkg', default=GPKG_PATH, help=f"GeoPackage to write (default: {GPKG_PATH})")
+    parser.add_argument('--parquet', default=PARQUET_PATH, help=f"GeoParquet file to write (default: {PARQUET_PATH})")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    gdf = build_frame(load_routes())
+    write_gpkg(gdf, args.gpkg)
+    write_parquet(gdf, args.parquet)
+
+    counts = gdf['feature_type'].value_counts()
+    print(f"Exported {counts.get('route', 0)} routes and {counts.get('stop', 0)} stops in {time.time() - start_time:.1f} s")
+    for path in (args.gpkg, args.parquet):
+        print(f"  {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,278 @@
-from bs4 import BeautifulSoup
+"""Extract the route list from the route map page into routes.json.
+
+The page is parsed as a stream of tags, with lxml's C parser when it is
+installed and the standard library's html.parser otherwise; no document tree
+is built. Routes keep the page's order, which is the order the site shows
+them in. Fields the page doesn't carry (ref, or anything added to routes.json
+by hand) are kept from the previous routes.json entry with the same relationId.
+
+Nothing is written when the page has invalid colours, unknown display types or
+duplicate relationIds, nor when the result equals the current file. Otherwise a
+diff report (added, removed, recoloured, renamed, retyped relationIds) is
+written next to the output for the converters and the commit message.
+
+Pages without any routes are rejected, and so are pages that would remove more
+than half of the current routes unless --allow-removals is given.
+
+  python extract_routes.py <input_html> <output_json> [--diff routes-diff.json] [--allow-removals]
+"""
+import argparse
 import json
 import os
+import re
 import sys
 
-def extract_routes(html_file, output_file):
+COLOR_PATTERN = re.compile(r'#(?:[0-9A-Fa-f]{3}|[0-9A-Fa-f]{6})')
+ROUTE_TYPES = ['ways_with_points', 'ways']
+# Key order of a routes.json entry; anything else follows, sorted
+ROUTE_KEYS = ['name', 'ref', 'relationId', 'color', 'type']
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source',
+             'track', 'wbr'}
+CHUNK_SIZE = 64 * 1024
+# Refuse to drop more than this share of the current routes without --allow-removals
+MAX_REMOVED_SHARE = 0.5
+
+class RouteListHandler:
+    """Collects categories and routes from start/end/data events.
+
+    Has the interface of an lxml parser target; StdlibAdapter drives it from
+    html.parser. Matches the markup the old BeautifulSoup selectors did:
+    .route-map-collapsible sections, named by the first span of their
+    .route-map-collapsible-bar, holding .route-option checkboxes followed by
+    the route name.
+    """
+
+    def __init__(self):
+        self.stack = []
+        self.categories = []
+        self.category = None
+        self.capture = None
+        self.text = []
+
+    def classes(self, attrib):
+        return (attrib.get('class') or '').split()
+
+    def inside(self, css_class):
+        return any(css_class in classes for tag, classes in self.stack)
+
+    def start(self, tag, attrib):
+        self.finish_capture()
+        tag = tag.lower()
+        classes = self.classes(attrib)
+        if 'route-map-collapsible' in classes:
+            self.category = {'name': None, 'routes': []}
+            self.categories.append(self.category)
+        elif tag == 'span' and self.category and self.category['name'] is None \
+                and self.inside('route-map-collapsible-bar'):
+            self.capture = 'category'
+        elif tag == 'input' and (attrib.get('type') or '').lower() == 'checkbox' \
+                and self.category and self.inside('route-option'):
+            route = {
+                'relationId': attrib.get('data-relation-id'),
+                'color': attrib.get('data-route-color'),
+                'type': attrib.get('data-display-type'),
+            }
+            if attrib.get('data-route-ref'):
+                route['ref'] = attrib['data-route-ref']
+            self.category['routes'].append(route)
+            self.capture = 'route'
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, classes))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if tag in VOID_TAGS:
+            return
+        self.finish_capture()
+        # Tolerate unclosed elements: pop back to the matching start tag
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                if 'route-map-collapsible' in self.stack[i][1]:
+                    self.category = None
+                del self.stack[i:]
+                break
+
+    def data(self, text):
+        if self.capture:
+            self.text.append(text)
+
+    def finish_capture(self):
+        if not self.capture:
+            return
+        text = ''.join(self.text).strip()
+        if self.capture == 'category':
+            self.category['name'] = text
+        else:
+            self.category['routes'][-1]['name'] = text
+        self.capture = None
+        self.text = []
+
+    def close(self):
+        self.finish_capture()
+        return [category for category in self.categories if category['routes']]
+
+def parse_with_lxml(f, handler):
+    from lxml import etree
+    parser = etree.HTMLParser(target=handler, encoding='utf-8')
+    while chunk := f.read(CHUNK_SIZE):
+        parser.feed(chunk)
+    return parser.close()
+
+def parse_with_stdlib(f, handler):
+    from html.parser import HTMLParser
+
+    class StdlibAdapter(HTMLParser):
+        def handle_starttag(self, tag, attrs):
+            handler.start(tag, {name: value or '' for name, value in attrs})
+
+        def handle_startendtag(self, tag, attrs):
+            self.handle_starttag(tag, attrs)
+            handler.end(tag)
+
+        def handle_endtag(self, tag):
+            handler.end(tag)
+
+        def handle_data(self, data):
+            handler.data(data)
+
+    parser = StdlibAdapter()
+    while chunk := f.read(CHUNK_SIZE):
+        parser.feed(chunk)
+    parser.close()
+    return handler.close()
+
+def parse_route_list(html_file):
+    with open(html_file, 'rb') as f:
+        try:
+            return parse_with_lxml(f, RouteListHandler())
+        except ImportError:
+            pass
     with open(html_file, 'r', encoding='utf-8') as f:
-        soup = BeautifulSoup(f, 'html.parser')
-
-    categories = []
-    
-    # Find all collapsible route sections
-    for collapsible in soup.select('.route-map-collapsible'):
-        category_name = collapsible.select_one('.route-map-collapsible-bar span').text.strip()
-        
+        return parse_with_stdlib(f, RouteListHandler())
+
+def validate(categories):
+    """Return a list of problems; an empty list means the routes can be written."""
+    problems = []
+    seen = {}
+    if not any(category['routes'] for category in categories):
+        # A page without the route list markup would otherwise empty routes.json
+        problems.append("No routes found; is this the route map page?")
+    for category in categories:
+        if not category['name']:
+            problems.append("A route category has no name")
+        for route in category['routes']:
+            label = f"{route.get('name') or '(no name)'} in {category['name']}"
+            relation_id = route.get('relationId') or ''
+            if not relation_id.isdigit():
+                problems.append(f"{label}: invalid relationId {relation_id!r}")
+            elif relation_id in seen:
+                problems.append(f"{label}: relationId {relation_id} already used by {seen[relation_id]}")
+            else:
+                seen[relation_id] = label
+            if not COLOR_PATTERN.fullmatch(route.get('color') or ''):
+                problems.append(f"{label}: invalid colour {route.get('color')!r}")
+            if route.get('type') not in ROUTE_TYPES:
+                problems.append(f"{label}: unknown display type {route.get('type')!r}")
+            if not route.get('name'):
+                problems.append(f"{label}: route has no name")
+    return problems
+
+def routes_by_id(routes_data):
+    return {
+        route['relationId']: (category['name'], route)
+        for category in routes_data.get('categories', [])
+        for route in category['routes']
+    }
+
+def ordered_route(route):
+    keys = [key for key in ROUTE_KEYS if key in route] + sorted(key for key in route if key not in ROUTE_KEYS)
+    return {key: route[key] for key in keys}
+
+def merge_previous(categories, previous):
+    """Fill in fields the page doesn't have from the previous routes.json entries."""
+    merged = []
+    for category in categories:
         routes = []
-        for checkbox in collapsible.select('.route-option input[type="checkbox"]'):
-            route_data = {
-                'name': checkbox.next_sibling.strip(),
-                'relationId': checkbox['data-relation-id'],
-                'color': checkbox['data-route-color'],
-                'type': checkbox['data-display-type']
-            }
-            routes.append(route_data)
-        
-        if routes:
-            categories.append({
-                'name': category_name,
-                'routes': routes
-            })
-    
+        for route in category['routes']:
+            old = previous.get(route['relationId'], (None, {}))[1]
+            routes.append(ordered_route({**old, **route}))
+        merged.append({'name': category['name'], 'routes': routes})
+    return {'categories': merged}
+
+def diff_routes(previous, current):
+    report = {'added': [], 'removed': [], 'recoloured': [], 'renamed': [], 'retyped': [], 'moved': []}
+    for relation_id, (category, route) in current.items():
+        if relation_id not in previous:
+            report['added'].append(relation_id)
+            continue
+        old_category, old = previous[relation_id]
+        for key, field in (('recoloured', 'color'), ('renamed', 'name'), ('retyped', 'type')):
+            if old.get(field) != route.get(field):
+                report[key].append({'relationId': relation_id, 'from': old.get(field), 'to': route.get(field)})
+        if old_category != category:
+            report['moved'].append({'relationId': relation_id, 'from': old_category, 'to': category})
+    report['removed'] = [relation_id for relation_id in previous if relation_id not in current]
+    return report
+
+def load_json(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def extract_routes(html_file, output_file, diff_file=None, allow_removals=False):
+    """Update output_file from the page; returns the diff report, or None if nothing changed.
+
+    Raises ValueError when the page fails validation or, unless allow_removals
+    is set, when it would remove more than MAX_REMOVED_SHARE of the routes.
+    """
+    categories = parse_route_list(html_file)
+    problems = validate(categories)
+    if problems:
+        raise ValueError("Route list has problems:\n  " + "\n  ".join(problems))
+
+    previous_data = load_json(output_file)
+    previous = routes_by_id(previous_data)
+    routes_data = merge_previous(categories, previous)
+    text = json.dumps(routes_data, indent=2, ensure_ascii=False) + '\n'
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            if f.read() == text:
+                return None
+
+    report = diff_routes(previous, routes_by_id(routes_data))
+    if previous and not allow_removals and len(report['removed']) > MAX_REMOVED_SHARE * len(previous):
+        raise ValueError(f"The page would remove {len(report['removed'])} of {len(previous)} routes; "
+                         f"rerun with --allow-removals if that is intended")
     # Create output directory if not exists
-    os.makedirs(os.path.dirname(output_file), exist_ok=True)
-    
+    os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({'categories': categories}, f, indent=2, ensure_ascii=False)
+        f.write(text)
+    diff_file = diff_file or os.path.join(os.path.dirname(output_file), 'routes-diff.json')
+    with open(diff_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return report
 
-if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        print("Usage: python extract_routes.py <input_html> <output_json>")
+def main():
+    parser = argparse.ArgumentParser(description="Extract the route list from the route map page into routes.json")
+    parser.add_argument('input_html')
+    parser.add_argument('output_json')
+    parser.add_argument('--diff', help="where to write the diff report (default: routes-diff.json next to the output)")
+    parser.add_argument('--allow-removals', action='store_true',
+                        help=f"write even if more than {MAX_REMOVED_SHARE:.0%} of the current routes would be removed")
+    args = parser.parse_args()
+
+    try:
+        report = extract_routes(args.input_html, args.output_json, args.diff, args.allow_removals)
+    except ValueError as e:
+        print(e)
         sys.exit(1)
-        
-    extract_routes(sys.argv[1], sys.argv[2])
+    if report is None:
+        print(f"{args.output_json} is up to date")
+        return
+    changes = ", ".join(f"{len(items)} {key}" for key, items in report.items() if items)
+    print(f"Updated {args.output_json}: {changes or 'formatting only'}")
+
+if __name__ == '__main__':
+    main()
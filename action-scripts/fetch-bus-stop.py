@@ -1,327 +1,299 @@
-import requests
+import argparse
+import asyncio
 import json
 import time
 import os
-from datetime import datetime
+from geojson_writer import profile_from_env, write_geojson
+from metrics import run_metrics
+from osm_index import OsmIndex
+from osm_state import get_timestamp, save_timestamp
+from overpass import ElementParser
+from route_pipeline import ROUTE_DATA_DIR, load_routes
+from spatial_index import TransitIndex
+from stop_table import StopTable, stop_report, write_report
+from overpass_async import AsyncOverpassClient
 
 # Bounding box for Greater Bandung
 BBOX = "-7.119970883040842,107.29935103886602,-6.7164372353137045,108.00522056337834"
+# Untagged stops pick up routes whose ways pass this close (metres)
+PROXIMITY_RADIUS = 25
 
-# Function to query Overpass API with rate limiting
-def fetch_overpass(query, retries=3, delay=2):
-    base_url = "https://maps.mail.ru/osm/tools/overpass/api/interpreter"
-    
-    for attempt in range(1, retries + 1):
-        try:
-            response = requests.post(base_url, data=query, timeout=60)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            if response.status_code == 429:  # Rate limit
-                wait_time = delay * (2 ** attempt)  # Exponential backoff
-                print(f"Rate limited. Waiting {wait_time} seconds...")
-                time.sleep(wait_time)
-                continue
-            if attempt == retries:
-                raise
-            print(f"HTTP error (attempt {attempt}/{retries}): {e}")
-            time.sleep(delay * attempt)
-        except requests.RequestException as e:
-            if attempt == retries:
-                raise
-            print(f"Request error (attempt {attempt}/{retries}): {e}")
-            time.sleep(delay * attempt)
-
-# Fetch all bus stops in single query
-def fetch_all_bus_stops():
-    print("Fetching all bus stops in the area...")
-    
-    query = f"""
+# Stops and the bus routes they belong to in one query; the relations' member
+# lists are enough to tell which stops a route serves
+def stops_and_routes_query(bbox=BBOX):
+    return f"""
     [out:json][timeout:180];
-    (
-      node["highway"="bus_stop"]({BBOX});
-    );
+    node["highway"="bus_stop"]({bbox})->.stops;
+    rel(bn.stops)["type"="route"]["route"="bus"]->.routes;
+    (.stops; .routes;);
     out body;
     """
-    
-    data = fetch_overpass(query)
-    print(f"Found {len(data.get('elements', []))} total bus stops")
-    return data.get("elements", [])
-
-# FIXED: Fetch all bus routes in one query, then match locally
-def fetch_all_bus_routes_and_match():
-    """Fetch all bus routes in the area once, then match to stops locally"""
-    print("Fetching all bus routes in the area...")
-    
-    # First, get all bus routes in the bounding box
-    query = f"""
+
+async def fetch_stops_and_routes():
+    """Fetch everything needed for route matching at once and index it locally.
+
+    rel(bn.stops) returns every bus route relation that has one of the stops as
+    a member, which is what the old per-node queries asked for one node at a
+    time, so the local lookup is as accurate without any further requests.
+    """
+    print("Fetching bus stops and the bus routes serving them...")
+
+    async with AsyncOverpassClient() as client:
+        parser = ElementParser()
+        features, index = await aindex_stops_and_routes(client.iter_elements(stops_and_routes_query(), parser))
+    index.osm_base = parser.osm_base
+    print(f"Found {index.node_count} nodes and {index.relation_count} bus routes")
+    return features, index
+
+def index_stops_and_routes(elements):
+    """Build stop features (routes not filled in yet) and the route index.
+
+    Works on any iterable of elements; fed from the streaming parser, stop
+    features are built as nodes arrive and only the node -> routes mapping of
+    the relations is kept.
+    """
+    index = OsmIndex()
+    features = []
+    for element in elements:
+        add_element(element, index, features)
+    return features, index
+
+async def aindex_stops_and_routes(elements):
+    """index_stops_and_routes() for an async stream of elements."""
+    index = OsmIndex()
+    features = []
+    async for element in elements:
+        add_element(element, index, features)
+    return features, index
+
+def add_element(element, index, features):
+    index.add(element)
+    if is_bus_stop(element) and in_bbox(element):
+        features.append(build_stop_feature(element))
+
+def is_bus_stop(element):
+    return element["type"] == "node" and element.get("tags", {}).get("highway") == "bus_stop"
+
+def in_bbox(node, bbox=BBOX):
+    south, west, north, east = (float(v) for v in bbox.split(","))
+    return south <= node["lat"] <= north and west <= node["lon"] <= east
+
+def build_stop_feature(stop):
+    tags = stop.get("tags", {})
+    return {
+        "type": "Feature",
+        "geometry": {
+            "type": "Point",
+            "coordinates": [stop["lon"], stop["lat"]]
+        },
+        "properties": {
+            "id": stop["id"],
+            "name": tags.get("name"),
+            "shelter": tags.get("shelter"),
+            "pole": tags.get("pole"),
+            "lit": tags.get("lit"),
+            "bench": tags.get("bench"),
+            "bin": tags.get("bin"),
+            "routes": [],
+            "route_count": 0,
+            # Set for all new stops at once by classify_new_stops()
+            "category": None
+        }
+    }
+
+def classify_new_stops(features):
+    """Give every stop without a category one, in a single columnar pass.
+
+    Stops kept from the saved file in a delta run keep theirs: the file doesn't
+    carry the shelter and pole tags to classify them again.
+    """
+    new = [feature for feature in features if feature["properties"]["category"] is None]
+    for feature, category in zip(new, StopTable(new).classify().tolist()):
+        feature["properties"]["category"] = category
+    return len(new)
+
+def match_routes(features, index):
+    for feature in features:
+        props = feature["properties"]
+        props["routes"] = index.routes_for_node(props["id"])
+        props["route_count"] = len(props["routes"])
+
+def add_proximity_routes(features, routes_data, route_data_dir=ROUTE_DATA_DIR):
+    """Give stops without routes the routes passing within PROXIMITY_RADIUS; returns how many got some."""
+    proximity_index = TransitIndex.from_stops(features)
+    proximity_index.add_routes_from_data(routes_data, route_data_dir)
+    proximity_matches = 0
+    for feature in features:
+        props = feature["properties"]
+        if props["routes"]:
+            continue
+        lon, lat = feature["geometry"]["coordinates"]
+        nearby = proximity_index.routes_near(lon, lat, PROXIMITY_RADIUS)
+        if nearby:
+            props["routes"] = sorted(nearby)
+            props["route_count"] = len(props["routes"])
+            props["routes_source"] = "proximity"
+            proximity_matches += 1
+    return proximity_matches
+
+# Stops and bus routes changed since `since`, plus the ids of all current ones
+# so deleted stops and routes can be dropped
+def stop_changes_query(since, bbox=BBOX):
+    return f"""
     [out:json][timeout:180];
+    node["highway"="bus_stop"]({bbox})->.stops;
+    rel(bn.stops)["type"="route"]["route"="bus"]->.routes;
+    node.stops(newer:"{since}")->.changed;
     (
-      relation["type"="route"]["route"="bus"]({BBOX});
-    );
-    out body;
+      rel.routes(newer:"{since}");
+      rel(bn.changed)["type"="route"]["route"="bus"];
+    )->.touched;
+    .changed out body;
+    .touched out body;
+    .stops out ids;
+    .routes out ids;
     """
-    
-    try:
-        data = fetch_overpass(query)
-        routes = data.get("elements", [])
-        print(f"Found {len(routes)} bus routes")
-        
-        # Create a mapping of node_id -> list of route_ids
-        node_to_routes = {}
-        
-        for route in routes:
-            if route["type"] != "relation":
-                continue
-                
-            route_id = route["id"]
-            # Look for node members in this route
-            for member in route.get("members", []):
-                if member["type"] == "node":
-                    member_role = member.get("role", "")
-                    # FIX: Include ALL platform roles including entry/exit
-                    if member_role in ["", "stop", "platform", "platform_entry_only", "platform_exit_only"]:
-                        node_id = member["ref"]
-                        if node_id not in node_to_routes:
-                            node_to_routes[node_id] = []
-                        if route_id not in node_to_routes[node_id]:  # Avoid duplicates
-                            node_to_routes[node_id].append(route_id)
-        
-        return node_to_routes
-        
-    except Exception as e:
-        print(f"Error fetching routes: {e}")
-        return {}
 
-# FIXED: Fetch routes in a smarter way with batch queries
-def fetch_routes_for_nodes_smart(node_ids):
-    """Fetch routes for nodes using smarter batching to avoid rate limits"""
-    import concurrent.futures
-    
-    node_routes = {}
-    
-    # Group nodes into batches of 10
-    batches = [node_ids[i:i+10] for i in range(0, len(node_ids), 10)]
-    print(f"Processing {len(batches)} batches of up to 10 nodes each")
-    
-    def fetch_batch(batch_nodes):
-        try:
-            # Create a query for multiple nodes at once
-            node_list = ",".join(str(node_id) for node_id in batch_nodes)
-            query = f"""
-            [out:json][timeout:60];
-            node(id:{node_list});
-            rel(bn)["type"="route"]["route"="bus"];
-            out body;
-            """
-            
-            data = fetch_overpass(query)
-            
-            # Initialize all nodes in batch with empty routes
-            batch_result = {}
-            for node_id in batch_nodes:
-                batch_result[node_id] = []
-            
-            # Parse relations and check member roles
-            for element in data.get("elements", []):
-                if element["type"] == "relation" and "members" in element:
-                    relation_id = element["id"]
-                    # Check each member for platform roles
-                    for member in element["members"]:
-                        if member["type"] == "node":
-                            member_role = member.get("role", "")
-                            # FIX: Include ALL platform roles
-                            if member_role in ["", "stop", "platform", "platform_entry_only", "platform_exit_only"]:
-                                node_id = member["ref"]
-                                if node_id in batch_nodes and relation_id not in batch_result[node_id]:
-                                    batch_result[node_id].append(relation_id)
-            
-            return batch_result
-            
-        except Exception as e:
-            print(f"Error fetching batch: {e}")
-            # Return empty routes for this batch
-            return {node_id: [] for node_id in batch_nodes}
-    
-    # Use ThreadPoolExecutor but with max 2 workers and delays
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
-        futures = []
-        
-        for i, batch in enumerate(batches):
-            # Add delay between submitting batches
-            if i > 0:
-                time.sleep(5)  # 5 second delay between batch submissions
-            
-            future = executor.submit(fetch_batch, batch)
-            futures.append(future)
-            print(f"Submitted batch {i+1}/{len(batches)}")
-        
-        # Collect results
-        for future in concurrent.futures.as_completed(futures):
-            batch_result = future.result()
-            node_routes.update(batch_result)
-    
-    return node_routes
+async def fetch_stop_changes(since):
+    print(f"Fetching bus stops and bus routes changed since {since}...")
+    async with AsyncOverpassClient() as client:
+        parser = ElementParser()
+        elements = [element async for element in client.iter_elements(stop_changes_query(since), parser)]
+    if parser.osm_base is None:
+        raise ValueError("Overpass response has no timestamp_osm_base")
+    return elements, parser.osm_base
 
-# ORIGINAL SIMPLE APPROACH - Most accurate
-def fetch_routes_original_approach(node_ids):
-    """Original approach: fetch routes for each node individually with threading"""
-    import concurrent.futures
-    
-    node_routes = {}
-    
-    def fetch_single_node(node_id):
-        try:
-            query = f"""
-            [out:json][timeout:30];
-            node({node_id});
-            rel(bn)["type"="route"]["route"="bus"];
-            out body;
-            """
-            data = fetch_overpass(query)
-            routes = []
-            # Check member roles in each relation
-            for element in data.get("elements", []):
-                if element["type"] == "relation" and "members" in element:
-                    # Check if this node is a member with any platform role
-                    for member in element["members"]:
-                        if member["type"] == "node" and member["ref"] == node_id:
-                            member_role = member.get("role", "")
-                            # Include ALL platform roles
-                            if member_role in ["", "stop", "platform", "platform_entry_only", "platform_exit_only"]:
-                                routes.append(element["id"])
-                                break  # Found this node in relation
-            return (node_id, routes)
-        except Exception as e:
-            print(f"Error fetching routes for node {node_id}: {e}")
-            return (node_id, [])
-    
-    # Use threading to speed up individual requests
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        futures = [executor.submit(fetch_single_node, node_id) for node_id in node_ids]
-        
-        for future in concurrent.futures.as_completed(futures):
-            node_id, routes = future.result()
-            node_routes[node_id] = routes
-    
-    return node_routes
+def load_stop_features(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["features"]
 
-# Function to determine category
-def get_stop_category(shelter, pole):
-    shelter_str = str(shelter).lower() if shelter is not None else "no"
-    
-    if shelter_str == "yes":
-        if pole is None or pole == "":
-            return "1_shelter_yes_pole_none"
-        elif any(val in str(pole).lower() for val in ["yes", "traffic_sign"]):
-            return "5_shelter_yes_pole_sign"
-        elif "totem" in str(pole).lower():
-            return "6_shelter_yes_pole_totem"
-        elif "flag" in str(pole).lower():
-            return "7_shelter_yes_pole_flag"
-        else:
-            return "1_shelter_yes_pole_none"
-    else:
-        if any(val in str(pole).lower() for val in ["yes", "traffic_sign"]):
-            return "2_shelter_none_pole_sign"
-        elif "totem" in str(pole).lower():
-            return "3_shelter_none_pole_totem"
-        elif "flag" in str(pole).lower():
-            return "4_shelter_none_pole_flag"
+def apply_stop_changes(features, elements):
+    """Patch saved stop features with the answer to stop_changes_query().
+
+    "out body" elements carry coordinates (nodes) or members (relations),
+    "out ids" ones only the id. Every stop's routes are rebuilt from what is
+    still known: relations that weren't touched keep their stops, touched ones
+    are re-read from their member lists. Proximity matches are dropped, to be
+    redone by add_proximity_routes(). Returns the patched features sorted by
+    id (the order a full fetch gives) and a dict of change counts.
+    """
+    changed_stops = [e for e in elements if is_bus_stop(e) and "lat" in e]
+    touched = [e for e in elements if e["type"] == "relation" and "members" in e]
+    stop_ids = {e["id"] for e in elements if e["type"] == "node"}
+    route_ids = {e["id"] for e in elements if e["type"] == "relation"}
+    touched_ids = {relation["id"] for relation in touched}
+
+    by_id = {feature["properties"]["id"]: feature for feature in features if feature["properties"]["id"] in stop_ids}
+    removed = len(features) - len(by_id)
+    for node in changed_stops:
+        if in_bbox(node):
+            by_id[node["id"]] = build_stop_feature(node)
         else:
-            return "8_shelter_none_pole_none"
+            by_id.pop(node["id"], None)
+
+    member_routes = OsmIndex.from_elements(touched)
+    for stop_id, feature in by_id.items():
+        props = feature["properties"]
+        kept = [] if props.pop("routes_source", None) == "proximity" else props.get("routes", [])
+        routes = {r for r in kept if r in route_ids and r not in touched_ids}
+        routes.update(member_routes.routes_for_node(stop_id))
+        props["routes"] = sorted(routes)
+        props["route_count"] = len(props["routes"])
+
+    stats = {"stops_changed": len(changed_stops), "stops_removed": removed, "routes_changed": len(touched)}
+    return [by_id[stop_id] for stop_id in sorted(by_id)], stats
 
 def main():
+    parser = argparse.ArgumentParser(description="Fetch Greater Bandung bus stops and the routes serving them")
+    parser.add_argument("--delta", action="store_true",
+                        help="only fetch what changed since the last run and patch the saved file "
+                             "(falls back to a full fetch when that isn't possible)")
+    args = parser.parse_args()
+
     # Create output directory
     OUTPUT_DIR = "route-data/bus-stop"
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     print(f"Created output directory: {OUTPUT_DIR}")
     start_time = time.time()
     
-    # Fetch all bus stops
-    print("Step 1: Fetching bus stops...")
-    all_stops = fetch_all_bus_stops()
-    
-    if not all_stops:
-        print("No bus stops found!")
-        return
-    
-    # Extract node IDs
-    node_ids = [stop["id"] for stop in all_stops if stop["type"] == "node"]
-    print(f"Step 2: Processing {len(node_ids)} bus stops...")
-    
-    # CHOOSE ONE APPROACH FOR FETCHING ROUTES:
-    
-    # Option A: Fetch all routes once and match locally (FASTEST) - FIXED
-    print("Step 3: Fetching route associations (bulk method)...")
-    node_routes = fetch_all_bus_routes_and_match()
-    
-    # Option B: Use smart batching (slower but more accurate) - FIXED
-    # print("Step 3: Fetching route associations (batched method)...")
-    # node_routes = fetch_routes_for_nodes_smart(node_ids)
-    
-    # Option C: Original individual approach (most accurate) - FIXED
-    # print("Step 3: Fetching route associations (original method)...")
-    # node_routes = fetch_routes_original_approach(node_ids)
-    
-    # Process and save
-    print("Step 4: Creating GeoJSON...")
-    features = []
-    
-    for stop in all_stops:
-        if stop["type"] != "node":
-            continue
-            
-        tags = stop.get("tags", {})
-        
-        feature = {
-            "type": "Feature",
-            "geometry": {
-                "type": "Point",
-                "coordinates": [stop["lon"], stop["lat"]]
-            },
-            "properties": {
-                "id": stop["id"],
-                "name": tags.get("name"),
-                "shelter": tags.get("shelter"),
-                "pole": tags.get("pole"),
-                "lit": tags.get("lit"),
-                "bench": tags.get("bench"),
-                "bin": tags.get("bin"),
-                "routes": node_routes.get(stop["id"], []),
-                "route_count": len(node_routes.get(stop["id"], [])),
-                "category": get_stop_category(tags.get("shelter"), tags.get("pole"))
-            }
-        }
-        features.append(feature)
-    
-    # Save to file
     output_path = f"{OUTPUT_DIR}/all_bus_stops.geojson"
+    features = None
+    since = get_timestamp("stops")
+    if args.delta and since and os.path.exists(output_path):
+        # Patch the saved stops with what changed since the last run
+        print("Step 1: Fetching changes since the last run...")
+        try:
+            with run_metrics.stage("fetch_changes"):
+                elements, osm_base = asyncio.run(fetch_stop_changes(since))
+            with run_metrics.stage("apply_changes"):
+                features, stats = apply_stop_changes(load_stop_features(output_path), elements)
+            print(f"  {stats['stops_changed']} stops changed, {stats['stops_removed']} removed, "
+                  f"{stats['routes_changed']} routes re-read")
+        except Exception as e:
+            print(f"  Delta update failed ({e}), falling back to a full fetch")
+            features = None
+    elif args.delta:
+        print("No previous run to diff against, doing a full fetch")
+
+    if features is None:
+        # Fetch stops and routes in one request
+        print("Step 1: Fetching bus stops and route associations...")
+        with run_metrics.stage("fetch"):
+            features, index = asyncio.run(fetch_stops_and_routes())
+
+        if not features:
+            print("No bus stops found!")
+            return
+
+        # Match stops to routes locally
+        print(f"Step 2: Matching {len(features)} bus stops to routes...")
+        with run_metrics.stage("match_routes"):
+            match_routes(features, index)
+        osm_base = index.osm_base
+
+    # Stops nobody added to a relation still get the routes that pass right by them
+    print(f"Step 3: Matching untagged stops to routes passing within {PROXIMITY_RADIUS} m...")
+    with run_metrics.stage("proximity_routes"):
+        proximity_matches = add_proximity_routes(features, load_routes())
+
+    with run_metrics.stage("classify"):
+        classified = classify_new_stops(features)
+    print(f"Step 4: Classified {classified} new or changed stops")
+
+    # Save to file
     geojson = {
         "type": "FeatureCollection",
         "features": features
     }
     
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(geojson, f, ensure_ascii=False, indent=2)
+    with run_metrics.stage("save"):
+        size = write_geojson(output_path, geojson, profile_from_env(), layer="stops")
+    with run_metrics.stage("report"):
+        report = stop_report(StopTable(features), load_routes())
+        report_path = write_report(report, OUTPUT_DIR)
+    if osm_base:
+        save_timestamp("stops", osm_base)
+    run_metrics.write(OUTPUT_DIR)
     
     end_time = time.time()
     elapsed = end_time - start_time
     
-    print(f" Saved {len(features)} stops to {output_path}")
+    print(f" Saved {len(features)} stops to {output_path} ({size / 1024:.0f} KB)")
     print(f"  Total execution time: {elapsed:.2f} seconds ({elapsed/60:.1f} minutes)")
     
     # Print summary
-    stops_with_routes = sum(1 for f in features if f["properties"]["route_count"] > 0)
-    print(f" Summary:")
-    print(f"  Total stops: {len(features)}")
-    print(f"  Stops with routes: {stops_with_routes} ({stops_with_routes/len(features)*100:.1f}%)")
-    print(f"  Total route associations: {sum(len(f['properties']['routes']) for f in features)}")
+    print(f" Summary (full report in {report_path}):")
+    print(f"  Total stops: {report['stops']}")
+    print(f"  Stops with routes: {report['stops_with_routes']} "
+          f"({report['stops_with_routes']/max(report['stops'], 1)*100:.1f}%)")
+    print(f"  Stops matched by proximity only: {proximity_matches}")
+    print(f"  Total route associations: {report['route_associations']}")
+    print(f"  Sheltered stops: {report['sheltered']}")
+    for key, coverage in report["amenities"].items():
+        print(f"  Tagged {key}: {coverage['yes']} yes, {coverage['no']} no, {coverage['missing']} untagged")
     
     if elapsed > 480:  # 8 minutes
-        print("  Warning: Script took more than 8 minutes. Consider:")
-        print("  1. Using the bulk route fetching method (Option A)")
-        print("  2. Reducing the bounding box size")
+        print("  Warning: Script took more than 8 minutes. Consider reducing the bounding box size")
 
 if __name__ == "__main__":
     print("Starting bus stop extraction script...")
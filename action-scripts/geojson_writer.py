@@ -0,0 +1,114 @@
+"""Shared GeoJSON writer with size-oriented output profiles.
+
+A profile controls the JSON layout, coordinate precision, which properties
+each layer keeps and which pre-compressed siblings (.gz, .br) are written.
+Scripts pick the profile from GEOJSON_PROFILE (default: compact) and can add
+siblings with GEOJSON_COMPRESS, e.g. GEOJSON_COMPRESS=gz,br; br needs the brotli
+package, and asking for it without brotli installed is an error.
+"""
+import gzip
+import json
+import os
+from metrics import run_metrics
+
+# Properties each layer needs on the site; None keeps everything
+LAYER_PROPERTIES = {
+    # bus-stop-display.js reads name, routes, category and the lit/bench/bin facilities
+    'stops': ['id', 'name', 'routes', 'routes_source', 'category', 'lit', 'bench', 'bin'],
+    # Simplified route ways only need to say which OSM way they came from
+    'ways': ['id', 'name'],
+    # The shared road network: each OSM way once, with the routes running over it
+    'network': ['id', 'name', 'highway', 'routes', 'route_count', 'colors'],
+}
+
+COMPRESSIONS = ['gz', 'br']
+
+class OutputProfile:
+    def __init__(self, indent=None, precision=None, whitelist=True, drop_null=False, compress=()):
+        self.indent = indent
+        self.precision = precision
+        self.whitelist = whitelist
+        self.drop_null = drop_null
+        self.compress = tuple(compress)
+        for method in self.compress:
+            if method not in COMPRESSIONS:
+                raise ValueError(f"Unknown compression: {method}")
+            if method == 'br':
+                # Fail before anything is written rather than leave the .br files out
+                try:
+                    import brotli  # noqa: F401
+                except ImportError:
+                    raise ImportError("GEOJSON_COMPRESS asks for br but the brotli package is not installed") from None
+
+    def properties_for(self, layer):
+        return LAYER_PROPERTIES.get(layer) if self.whitelist else None
+
+PROFILES = {
+    # What the scripts used to write: everything, indented
+    'pretty': OutputProfile(indent=2, whitelist=False),
+    # 6 decimals is about 0.1 m, well below OSM's own accuracy
+    'compact': OutputProfile(precision=6, drop_null=True),
+}
+
+def profile_from_env(default='compact'):
+    name = os.environ.get('GEOJSON_PROFILE', default)
+    if name not in PROFILES:
+        raise ValueError(f"Unknown GeoJSON profile: {name}")
+    profile = PROFILES[name]
+    compress = os.environ.get('GEOJSON_COMPRESS')
+    if compress:
+        profile = OutputProfile(profile.indent, profile.precision, profile.whitelist, profile.drop_null,
+                                [c.strip() for c in compress.split(',') if c.strip()])
+    return profile
+
+def round_coordinates(coordinates, precision):
+    if isinstance(coordinates[0], (int, float)):
+        return [round(value, precision) for value in coordinates]
+    return [round_coordinates(part, precision) for part in coordinates]
+
+def shape_feature(feature, profile, keep):
+    geometry = feature.get('geometry')
+    if geometry and profile.precision is not None and geometry.get('coordinates'):
+        geometry = dict(geometry, coordinates=round_coordinates(geometry['coordinates'], profile.precision))
+
+    properties = feature.get('properties') or {}
+    if keep is not None:
+        properties = {key: properties[key] for key in keep if key in properties}
+    if profile.drop_null:
+        properties = {key: value for key, value in properties.items() if value is not None}
+
+    return {'type': 'Feature', 'geometry': geometry, 'properties': properties}
+
+def dumps(data, profile, layer=None):
+    keep = profile.properties_for(layer)
+    if data.get('type') == 'FeatureCollection':
+        data = dict(data, features=[shape_feature(feature, profile, keep) for feature in data['features']])
+    elif data.get('type') == 'Feature':
+        data = shape_feature(data, profile, keep)
+
+    if profile.indent is None:
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(data, ensure_ascii=False, indent=profile.indent)
+
+def write_compressed(path, raw, method):
+    if method == 'gz':
+        # mtime=0 keeps the file identical when the content is
+        with open(f"{path}.gz", 'wb') as f:
+            f.write(gzip.compress(raw, compresslevel=9, mtime=0))
+    elif method == 'br':
+        import brotli
+        with open(f"{path}.br", 'wb') as f:
+            f.write(brotli.compress(raw, quality=11))
+    else:
+        raise ValueError(f"Unknown compression: {method}")
+
+def write_geojson(path, data, profile=None, layer=None):
+    """Write a Feature or FeatureCollection with the given profile; returns bytes written."""
+    profile = profile or profile_from_env()
+    raw = dumps(data, profile, layer).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(raw)
+    for method in profile.compress:
+        write_compressed(path, raw, method)
+    run_metrics.count('features_written', len(data['features']) if 'features' in data else 1)
+    return len(raw)
@@ -0,0 +1,131 @@
+import io
+import os
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+STOP_ICON = 'http://maps.google.com/mapfiles/kml/pushpin/ylw-pushpin.png'
+
+def sanitize_filename(name):
+    return "".join([c if c.isalnum() or c in (' ', '-', '_') else '_' for c in name]).strip()
+
+def convert_hex_to_kml_color(hex_color):
+    hex_color = hex_color.lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = ''.join([c * 2 for c in hex_color])
+    elif len(hex_color) != 6:
+        hex_color = '000000'
+    rr, gg, bb = hex_color[0:2], hex_color[2:4], hex_color[4:6]
+    return f'ff{bb}{gg}{rr}'
+
+def kml_coordinates(coords):
+    # Same text simplekml wrote: lon,lat,alt with Python's float repr
+    return ' '.join(f"{float(c[0])},{float(c[1])},0.0" for c in coords)
+
+def write_line_style(f, style_id, kml_color):
+    f.write(f'        <Style id="{style_id}">\n'
+            f'            <LineStyle>\n'
+            f'                <color>{kml_color}</color>\n'
+            f'                <colorMode>normal</colorMode>\n'
+            f'                <width>4</width>\n'
+            f'            </LineStyle>\n'
+            f'        </Style>\n')
+
+def write_icon_style(f, style_id, href):
+    f.write(f'        <Style id="{style_id}">\n'
+            f'            <IconStyle>\n'
+            f'                <colorMode>normal</colorMode>\n'
+            f'                <scale>1</scale>\n'
+            f'                <heading>0</heading>\n'
+            f'                <Icon>\n'
+            f'                    <href>{escape(href)}</href>\n'
+            f'                </Icon>\n'
+            f'            </IconStyle>\n'
+            f'        </Style>\n')
+
+def write_extended_data(f, data):
+    f.write('        <ExtendedData>\n')
+    for name, value in data:
+        f.write(f'            <Data name={quoteattr(name)}>\n'
+                f'                <value>{escape(value)}</value>\n'
+                f'            </Data>\n')
+    f.write('        </ExtendedData>\n')
+
+def write_route_placemark(f, name, chains, style_id):
+    f.write(f'        <Placemark>\n'
+            f'            <name>{escape(name)}</name>\n'
+            f'            <styleUrl>#{style_id}</styleUrl>\n')
+    indent = '            '
+    if len(chains) > 1:
+        f.write('            <MultiGeometry>\n')
+        indent += '    '
+    for chain in chains:
+        f.write(f'{indent}<LineString>\n{indent}    <coordinates>')
+        f.write(kml_coordinates(chain))
+        f.write(f'</coordinates>\n{indent}</LineString>\n')
+    if len(chains) > 1:
+        f.write('            </MultiGeometry>\n')
+    f.write('        </Placemark>\n')
+
+def write_point_placemark(f, name, coords, style_id):
+    f.write(f'        <Placemark>\n'
+            f'            <name>{escape(name)}</name>\n'
+            f'            <styleUrl>#{style_id}</styleUrl>\n'
+            f'            <Point>\n'
+            f'                <coordinates>{kml_coordinates([coords])}</coordinates>\n'
+            f'            </Point>\n'
+            f'        </Placemark>\n')
+
+def write_route_kml(f, route):
+    """Stream one route's KML document to the text file f."""
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">\n'
+            '    <Document>\n')
+    # One shared style for the line and one for every stop, instead of a copy per placemark
+    write_line_style(f, 'route-line', convert_hex_to_kml_color(route.color))
+    write_icon_style(f, 'stop', STOP_ICON)
+    write_extended_data(f, [('route-name', route.name), ('source', 'Transport for Bandung')])
+
+    chains, gaps = route.stitched
+    if chains:
+        write_route_placemark(f, route.name, chains, 'route-line')
+    for feature in route.point_features:
+        props = feature.get('properties', {})
+        write_point_placemark(f, props.get('name', 'Stop'), feature['geometry']['coordinates'], 'stop')
+    f.write('    </Document>\n'
+            '</kml>\n')
+
+class KmlWriter:
+    """Writes one KML file per route into route-data/kml-named.
+
+    The document is streamed straight to disk. With kmz=True each route is
+    written as a zipped .kmz holding doc.kml instead.
+    """
+
+    version = 3
+
+    def __init__(self, output_dir, kmz=False):
+        self.output_dir = output_dir
+        self.name = os.path.basename(output_dir)
+        self.kmz = kmz
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, route):
+        if not route.features:
+            print(f"No features for {route.name}")
+            return []
+
+        base_name = sanitize_filename(route.name)
+        if not self.kmz:
+            filename = f"{base_name}.kml"
+            with open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8') as f:
+                write_route_kml(f, route)
+            return [filename]
+
+        filename = f"{base_name}.kmz"
+        with zipfile.ZipFile(os.path.join(self.output_dir, filename), 'w', zipfile.ZIP_DEFLATED) as archive:
+            # Fixed timestamp so unchanged routes give byte-identical archives
+            info = zipfile.ZipInfo('doc.kml', date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8') as f:
+                write_route_kml(f, route)
+        return [filename]
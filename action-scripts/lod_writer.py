@@ -0,0 +1,77 @@
+import json
+import os
+from geojson_writer import PROFILES, write_geojson
+from simplify import LocalProjection, simplify_lines
+from stitch import chains_geometry, feature_lines
+
+# Tolerances in metres, from street level down to a whole-city overview
+LOD_TOLERANCES = [2, 10, 30]
+
+def level_filename(tolerance):
+    return f"ways-{tolerance}m.geojson"
+
+class LodWriter:
+    """Writes the stitched ways simplified at each tolerance (geojson-lod/<relationId>).
+
+    levels.json next to them records, per level, the vertex counts and the
+    largest distance in metres between a dropped vertex and the simplified line.
+    """
+
+    version = 2
+
+    def __init__(self, output_dir, tolerances=LOD_TOLERANCES):
+        self.output_dir = output_dir
+        self.name = os.path.basename(output_dir)
+        self.tolerances = tolerances
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, route):
+        chains, gaps = route.stitched
+        if not chains:
+            print(f"No ways for {route.name}")
+            return []
+
+        route_dir = os.path.join(self.output_dir, route.relation_id)
+        os.makedirs(route_dir, exist_ok=True)
+        # Count against the ways as stored, before stitching merged their shared endpoints
+        original_vertices = sum(len(line) for line in feature_lines(route.features))
+        # One projection for the whole route so every level is measured the same way
+        projection = LocalProjection.for_lines(chains)
+
+        levels = []
+        for tolerance in self.tolerances:
+            lines, _, vertices, deviation = simplify_lines(chains, tolerance, projection)
+            feature = {'type': 'Feature', 'geometry': chains_geometry(lines), 'properties': {'name': route.name}}
+            filename = level_filename(tolerance)
+            write_geojson(os.path.join(route_dir, filename),
+                          {'type': 'FeatureCollection', 'features': [feature]}, PROFILES['compact'], layer='ways')
+            levels.append({
+                'tolerance_m': tolerance,
+                'file': filename,
+                'vertices': vertices,
+                'original_vertices': original_vertices,
+                'max_deviation_m': round(deviation, 2),
+            })
+
+        with open(os.path.join(route_dir, 'levels.json'), 'w') as f:
+            json.dump({'relationId': route.relation_id, 'levels': levels}, f, indent=2)
+        return [route.relation_id]
+
+    def report(self):
+        """Print vertex reduction and worst deviation per level over every route written so far."""
+        totals = {}
+        for relation_id in os.listdir(self.output_dir):
+            path = os.path.join(self.output_dir, relation_id, 'levels.json')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r') as f:
+                for level in json.load(f)['levels']:
+                    total = totals.setdefault(level['tolerance_m'], [0, 0, 0.0])
+                    total[0] += level['original_vertices']
+                    total[1] += level['vertices']
+                    total[2] = max(total[2], level['max_deviation_m'])
+
+        for tolerance, (before, after, deviation) in sorted(totals.items()):
+            reduction = (1 - after / before) * 100 if before else 0
+            print(f"LOD {tolerance} m: {before} -> {after} vertices (-{reduction:.1f}%), "
+                  f"max deviation {deviation:.2f} m")
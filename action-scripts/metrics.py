@@ -0,0 +1,77 @@
+"""Per-run stage timings, counters and peak memory, written as run-metrics.json.
+
+Scripts time their stages with `with run_metrics.stage('fetch'):`; shared
+modules (the Overpass clients, the GeoJSON writer, the route pipeline) bump
+counters on the same process-wide instance with run_metrics.count(). Counter
+names in use:
+
+  overpass_requests       HTTP requests sent to Overpass
+  overpass_retries        requests repeated after a failure
+  overpass_429            rate-limited answers
+  overpass_cache_hits     responses served from the local cache
+  bytes_downloaded        response bytes read from the network
+  features_written        features written by write_geojson()
+  files_written           output files written by the route pipeline
+  files_skipped           routes skipped because their outputs were current
+
+Counts bumped inside worker processes (convert-geojson.py --jobs) stay in the
+workers; the route pipeline tallies its files in the parent instead.
+"""
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_FILENAME = 'run-metrics.json'
+
+def peak_rss_kb(who=resource.RUSAGE_SELF):
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+class RunMetrics:
+    def __init__(self):
+        self.started = time.time()
+        self.stages = []
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'name': name,
+                'seconds': round(time.perf_counter() - start, 3),
+                'peak_rss_kb': peak_rss_kb(),
+            })
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self, script=None):
+        finished = time.time()
+        return {
+            'script': script or os.path.basename(sys.argv[0]),
+            'started_at': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+            'duration_s': round(finished - self.started, 3),
+            'stages': self.stages,
+            'counters': dict(sorted(self.counters.items())),
+            'peak_rss_kb': peak_rss_kb(),
+            # Worker processes, e.g. convert-geojson.py --jobs
+            'peak_rss_children_kb': peak_rss_kb(resource.RUSAGE_CHILDREN),
+        }
+
+    def write(self, output_dir, script=None):
+        """Write run-metrics.json into output_dir and return its path."""
+        path = os.path.join(output_dir, METRICS_FILENAME)
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(script), f, indent=2)
+            f.write('\n')
+        return path
+
+run_metrics = RunMetrics()
@@ -0,0 +1,43 @@
+# Member roles that tie a stop node to a route relation. Includes ALL platform
+# roles (entry/exit only) as well as untagged members.
+PLATFORM_ROLES = ["", "stop", "platform", "platform_entry_only", "platform_exit_only"]
+
+class OsmIndex:
+    """Which route relations each node belongs to, from an Overpass response.
+
+    Elements are added one at a time, so the index can be filled from a parsed
+    response or straight from a streaming parser. Only the node -> routes
+    mapping and the element counts are kept, which is all route matching needs.
+    """
+
+    def __init__(self):
+        self.node_routes = {}
+        self.node_count = 0
+        self.relation_count = 0
+        # Overpass data timestamp of the response, when the caller knows it
+        self.osm_base = None
+
+    @classmethod
+    def from_elements(cls, elements):
+        index = cls()
+        for element in elements:
+            index.add(element)
+        return index
+
+    def add(self, element):
+        if element["type"] == "node":
+            self.node_count += 1
+        elif element["type"] == "relation":
+            self.relation_count += 1
+            self._add_route_members(element)
+
+    def _add_route_members(self, relation):
+        relation_id = relation["id"]
+        for member in relation.get("members", []):
+            if member["type"] == "node" and member.get("role", "") in PLATFORM_ROLES:
+                routes = self.node_routes.setdefault(member["ref"], [])
+                if relation_id not in routes:  # Avoid duplicates
+                    routes.append(relation_id)
+
+    def routes_for_node(self, node_id):
+        return self.node_routes.get(node_id, [])
@@ -0,0 +1,34 @@
+"""OSM timestamps of the last successful refresh, for delta updates.
+
+route-data/osm-state.json maps each dataset ("routes", "stops") to the
+Overpass timestamp_osm_base its data was fetched at. Delta runs ask Overpass
+only for what changed after that time with the (newer:"...") filter and store
+the timestamp of the diff response once the changes are written.
+"""
+import json
+import os
+from overpass import post_overpass
+from route_pipeline import DATA_DIR
+
+STATE_PATH = os.path.join(DATA_DIR, 'osm-state.json')
+
+def load_state(path=STATE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def get_timestamp(dataset, path=STATE_PATH):
+    return load_state(path).get(dataset)
+
+def save_timestamp(dataset, timestamp, path=STATE_PATH):
+    state = load_state(path)
+    state[dataset] = timestamp
+    with open(path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def current_osm_base():
+    """Timestamp of the data Overpass serves right now, straight from the server (never cached)."""
+    response = post_overpass('[out:json][timeout:25];node(1);out ids;')
+    return response.json()['osm3s']['timestamp_osm_base']
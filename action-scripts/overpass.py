@@ -0,0 +1,132 @@
+"""Overpass response parsing shared by the Python action-scripts, plus a blocking POST.
+
+Data is downloaded with overpass_async.AsyncOverpassClient, which feeds the
+response through ElementParser here. post_overpass() is for small uncached
+requests such as asking for the current data timestamp. Both read:
+
+  OVERPASS_URL           endpoint, e.g. a local stand-in server for tests
+  OVERPASS_URLS          comma-separated endpoints to fail over between
+                         (async client; defaults to OVERPASS_URL or public mirrors)
+  OVERPASS_CACHE         use (default) | refresh | replay | off
+  OVERPASS_CACHE_DIR     cache directory (default: .overpass-cache in the repo)
+  OVERPASS_CACHE_TTL     seconds an entry counts as fresh (default: 86400)
+  OVERPASS_CACHE_MAX_MB  size at which old entries are evicted (default: 200)
+
+The OVERPASS_CACHE* settings apply to the async client (see overpass_cache.py).
+OVERPASS_CACHE=replay never touches the network, so re-runs and local
+development work offline once the responses have been recorded.
+"""
+import codecs
+import json
+import os
+import re
+import time
+import requests
+from metrics import run_metrics
+
+DEFAULT_ENDPOINTS = [
+    "https://maps.mail.ru/osm/tools/overpass/api/interpreter",
+    "https://overpass-api.de/api/interpreter",
+    "https://overpass.kumi.systems/api/interpreter",
+]
+OVERPASS_URL = os.environ.get('OVERPASS_URL', DEFAULT_ENDPOINTS[0])
+CHUNK_SIZE = 64 * 1024
+
+SEPARATORS = re.compile(r'[\s,]*')
+OSM_BASE = re.compile(r'"timestamp_osm_base"\s*:\s*"([^"]+)"')
+
+# POST a query to the Overpass API with retries and rate limiting
+def post_overpass(query, retries=3, delay=2, stream=False, headers=None):
+    for attempt in range(1, retries + 1):
+        if attempt > 1:
+            run_metrics.count('overpass_retries')
+        run_metrics.count('overpass_requests')
+        try:
+            response = requests.post(OVERPASS_URL, data=query, timeout=60, stream=stream, headers=headers)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.HTTPError as e:
+            if response.status_code == 429:  # Rate limit
+                run_metrics.count('overpass_429')
+                wait_time = delay * (2 ** attempt)  # Exponential backoff
+                print(f"Rate limited. Waiting {wait_time} seconds...")
+                time.sleep(wait_time)
+                continue
+            if attempt == retries:
+                raise
+            print(f"HTTP error (attempt {attempt}/{retries}): {e}")
+            time.sleep(delay * attempt)
+        except requests.RequestException as e:
+            if attempt == retries:
+                raise
+            print(f"Request error (attempt {attempt}/{retries}): {e}")
+            time.sleep(delay * attempt)
+    raise requests.RequestException(f"Overpass query failed after {retries} attempts")
+
+def iter_file_elements(f, chunk_size=CHUNK_SIZE):
+    """Stream the elements of a saved Overpass response from a binary file."""
+    return iter_elements(iter(lambda: f.read(chunk_size), b''))
+
+class ElementParser:
+    """Incrementally parse the "elements" array out of Overpass JSON byte chunks.
+
+    feed() takes the next chunk and returns the elements completed by it, so the
+    same parser serves blocking and asyncio downloads. osm_base is the data
+    timestamp from the header before the array, once it has been seen.
+    """
+
+    def __init__(self):
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.in_array = False
+        self.done = False
+        self.osm_base = None
+
+    def feed(self, chunk):
+        if self.done:
+            return []
+        buffer = self.buffer[self.pos:] + self.utf8.decode(chunk)
+        pos = 0
+        elements = []
+
+        if not self.in_array:
+            key = buffer.find('"elements"')
+            bracket = buffer.find('[', key) if key >= 0 else -1
+            if bracket < 0:
+                self.buffer, self.pos = buffer, 0
+                return elements
+            pos = bracket + 1
+            self.in_array = True
+            match = OSM_BASE.search(buffer, 0, key)
+            if match:
+                self.osm_base = match.group(1)
+
+        while True:
+            pos = SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                self.done = True
+                break
+            try:
+                element, pos = self.decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # Element continues in the next chunk
+            elements.append(element)
+
+        self.buffer, self.pos = buffer, pos
+        return elements
+
+    def close(self):
+        if not self.done:
+            raise ValueError("Overpass response ended before the elements array was closed")
+
+def iter_elements(chunks):
+    """Yield the elements of an Overpass response from an iterable of byte chunks."""
+    parser = ElementParser()
+    # Read to the end even after the array closes, so a caching source sees the complete body
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    parser.close()
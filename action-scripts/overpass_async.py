@@ -0,0 +1,212 @@
+"""asyncio Overpass client: pooled connections, one shared rate limit, endpoint failover.
+
+Configured like overpass.py (OVERPASS_URLS, OVERPASS_CACHE*) plus:
+
+  OVERPASS_RATE   requests per second across all endpoints (default: 0.5)
+  OVERPASS_BURST  requests allowed back to back before throttling (default: 2)
+"""
+import asyncio
+import email.utils
+import os
+import random
+import time
+import aiohttp
+from overpass import CHUNK_SIZE, DEFAULT_ENDPOINTS, OVERPASS_URL, ElementParser
+from metrics import run_metrics
+from overpass_cache import CacheMiss, OverpassCache
+
+if os.environ.get('OVERPASS_URLS'):
+    OVERPASS_ENDPOINTS = [url.strip() for url in os.environ['OVERPASS_URLS'].split(',') if url.strip()]
+elif os.environ.get('OVERPASS_URL'):
+    OVERPASS_ENDPOINTS = [OVERPASS_URL]
+else:
+    OVERPASS_ENDPOINTS = DEFAULT_ENDPOINTS
+
+# Statuses worth retrying; anything else (e.g. 400 for a bad query) fails at once
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class OverpassError(Exception):
+    pass
+
+class RetryableStatus(OverpassError):
+    pass
+
+class TokenBucket:
+    """Shared rate limit: refills `rate` tokens per second up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AsyncOverpassClient:
+    """Use as `async with AsyncOverpassClient() as client:`.
+
+    Every request first takes a token from the shared bucket. A 429/503 with
+    Retry-After puts that endpoint on cooldown for as long as asked, and the
+    retry goes to the next endpoint that isn't cooling down (or waits for the
+    first one to come back). Other failures back off with full jitter, a random
+    wait of up to backoff * 2**attempt seconds.
+    """
+
+    def __init__(self, endpoints=None, rate=None, burst=None, concurrency=4, retries=5,
+                 backoff=2.0, timeout=180, cache=None):
+        self.endpoints = list(endpoints or OVERPASS_ENDPOINTS)
+        rate = rate if rate is not None else float(os.environ.get('OVERPASS_RATE', 0.5))
+        burst = burst if burst is not None else float(os.environ.get('OVERPASS_BURST', 2))
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache or OverpassCache.from_env()
+        self.cooldown_until = {endpoint: 0.0 for endpoint in self.endpoints}
+        self.session = None
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def pick_endpoint(self, attempt):
+        """Next endpoint in rotation that isn't cooling down, or the one free soonest."""
+        now = time.monotonic()
+        ordered = self.endpoints[attempt % len(self.endpoints):] + self.endpoints[:attempt % len(self.endpoints)]
+        for endpoint in ordered:
+            if self.cooldown_until[endpoint] <= now:
+                return endpoint, 0.0
+        endpoint = min(ordered, key=self.cooldown_until.get)
+        return endpoint, self.cooldown_until[endpoint] - now
+
+    async def iter_chunks(self, query):
+        """Yield the raw response body in chunks, from the cache when possible."""
+        cache = self.cache
+        meta = cache.lookup(query)
+        if meta is not None and cache.is_fresh(meta):
+            run_metrics.count('overpass_cache_hits')
+            for chunk in cache.iter_body(query, CHUNK_SIZE):
+                yield chunk
+            return
+        if cache.mode == 'replay':
+            raise CacheMiss(f"No cached Overpass response for query:\n{query}")
+
+        headers = cache.conditional_headers(meta) if meta else {}
+        last_error = None
+        streaming = False
+
+        for attempt in range(self.retries):
+            endpoint, wait = self.pick_endpoint(attempt)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.bucket.acquire()
+            if attempt > 0:
+                run_metrics.count('overpass_retries')
+            run_metrics.count('overpass_requests')
+
+            try:
+                async with self.session.post(endpoint, data=query, headers=headers) as response:
+                    if response.status == 304 and meta is not None:
+                        run_metrics.count('overpass_cache_hits')
+                        cache.revalidated(query, meta)
+                        for chunk in cache.iter_body(query, CHUNK_SIZE):
+                            yield chunk
+                        return
+
+                    if response.status == 429:
+                        run_metrics.count('overpass_429')
+                    if response.status in RETRY_STATUSES:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        if retry_after is None:
+                            raise RetryableStatus(f"HTTP {response.status}")
+                        # The server said when to come back; try another endpoint meanwhile
+                        print(f"{endpoint} answered {response.status}, retry after {retry_after:.0f} s")
+                        self.cooldown_until[endpoint] = time.monotonic() + retry_after
+                        last_error = RetryableStatus(f"HTTP {response.status}")
+                        continue
+                    if response.status >= 400:
+                        text = await response.text()
+                        raise OverpassError(f"{endpoint}: HTTP {response.status}: {text[:200]}")
+
+                    entry = cache.open_entry(query) if cache.enabled else None
+                    streaming = True
+                    try:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            run_metrics.count('bytes_downloaded', len(chunk))
+                            if entry:
+                                entry.write(chunk)
+                            yield chunk
+                    except BaseException:
+                        if entry:
+                            entry.abort()
+                        raise
+                    if entry:
+                        entry.commit(response.headers)
+                    return
+
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+                if streaming:
+                    raise  # Part of the body was already handed out, can't start over
+                last_error = e
+                wait_time = random.uniform(0, self.backoff * (2 ** attempt))
+                print(f"Overpass request failed on {endpoint} (attempt {attempt + 1}/{self.retries}): {e!r}; "
+                      f"retrying in {wait_time:.1f} s")
+                await asyncio.sleep(wait_time)
+
+        if meta is not None:
+            # Better stale data than a failed run
+            print(f"Overpass unavailable ({last_error}), using cached response from {time.ctime(meta['fetched_at'])}")
+            for chunk in cache.iter_body(query, CHUNK_SIZE):
+                yield chunk
+            return
+        raise OverpassError(f"Overpass query failed after {self.retries} attempts: {last_error}")
+
+    async def iter_elements(self, query, parser=None):
+        """Yield the elements of the response one at a time while it downloads.
+
+        Pass an ElementParser to read the response's osm_base afterwards.
+        """
+        parser = parser or ElementParser()
+        async for chunk in self.iter_chunks(query):
+            for element in parser.feed(chunk):
+                yield element
+        parser.close()
+
+    async def fetch(self, query):
+        """Return the response's elements as a list."""
+        return [element async for element in self.iter_elements(query)]
+
+    async def fetch_many(self, queries):
+        """Run several queries concurrently; the bucket decides how fast they go out."""
+        return await asyncio.gather(*(self.fetch(query) for query in queries))
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, '..', '.overpass-cache')
+
+# use: serve fresh entries, fetch and store otherwise
+# refresh: always fetch (conditionally, if the entry has validators) and store
+# replay: serve from the cache only, whatever the age; a miss is an error
+# off: no cache at all
+CACHE_MODES = ['use', 'refresh', 'replay', 'off']
+
+# Overpass appends "remark" after the elements, so the end of the body is enough
+REMARK_WINDOW = 4096
+
+def normalize_query(query):
+    """Strip indentation and blank lines so the same query always gets the same key."""
+    return "\n".join(line.strip() for line in query.strip().splitlines() if line.strip())
+
+class CacheMiss(Exception):
+    pass
+
+class OverpassCache:
+    """On-disk cache of raw Overpass responses keyed by normalized query text.
+
+    Each entry is <key>.json (the response body as received) plus <key>.meta.json
+    with the query, fetch time and the HTTP validators used for conditional
+    refresh. An entry's file mtime is bumped on every hit, and the least
+    recently used entries are evicted once the cache grows past max_bytes.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, ttl=86400, max_bytes=200 * 1024 * 1024, mode='use'):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown Overpass cache mode: {mode}")
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.environ.get('OVERPASS_CACHE_DIR', DEFAULT_CACHE_DIR),
+            ttl=float(os.environ.get('OVERPASS_CACHE_TTL', 86400)),
+            max_bytes=int(float(os.environ.get('OVERPASS_CACHE_MAX_MB', 200)) * 1024 * 1024),
+            mode=os.environ.get('OVERPASS_CACHE', 'use'),
+        )
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def key(self, query):
+        return hashlib.sha256(normalize_query(query).encode('utf-8')).hexdigest()
+
+    def body_path(self, query):
+        return os.path.join(self.directory, f"{self.key(query)}.json")
+
+    def meta_path(self, query):
+        return os.path.join(self.directory, f"{self.key(query)}.meta.json")
+
+    def lookup(self, query):
+        """Return the entry's metadata, or None if there is no complete entry."""
+        if not self.enabled or not os.path.exists(self.body_path(query)):
+            return None
+        try:
+            with open(self.meta_path(query), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, meta):
+        if self.mode == 'replay':
+            return True
+        if self.mode == 'refresh':
+            return False
+        return time.time() - meta['fetched_at'] < self.ttl
+
+    def conditional_headers(self, meta):
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def iter_body(self, query, chunk_size):
+        path = self.body_path(query)
+        os.utime(path)  # Mark as recently used for eviction
+        with open(path, 'rb') as f:
+            yield from iter(lambda: f.read(chunk_size), b'')
+
+    def revalidated(self, query, meta):
+        """Record that the server confirmed the cached body is still current."""
+        self._write_meta(query, dict(meta, fetched_at=time.time()))
+
+    def open_entry(self, query):
+        os.makedirs(self.directory, exist_ok=True)
+        return CacheEntryWriter(self, query)
+
+    def _write_meta(self, query, meta):
+        with open(self.meta_path(query), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json') or filename.endswith('.meta.json'):
+                continue
+            path = os.path.join(self.directory, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        # The newest entry (the one just stored) is always kept
+        for mtime, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            meta_path = path[:-len('.json')] + '.meta.json'
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+            total -= size
+
+class CacheEntryWriter:
+    """Writes one response body to a temp file and moves it into the cache on commit.
+
+    An interrupted download therefore never leaves a truncated entry. Responses
+    ending in a "remark" (Overpass timeouts and runtime errors, sent with
+    status 200) are not cached.
+    """
+
+    def __init__(self, cache, query):
+        self.cache = cache
+        self.query = query
+        self.path = cache.body_path(query)
+        self.tmp_path = f"{self.path}.{os.getpid()}.{id(self)}.tmp"
+        self.file = open(self.tmp_path, 'wb')
+        self.size = 0
+        self.tail = b''
+
+    def write(self, chunk):
+        self.file.write(chunk)
+        self.size += len(chunk)
+        self.tail = (self.tail + chunk)[-REMARK_WINDOW:]
+
+    def abort(self):
+        self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def commit(self, headers):
+        self.file.close()
+        if b'"remark"' in self.tail:
+            print("Overpass response carries a remark, not caching it")
+            self.abort()
+            return
+        os.replace(self.tmp_path, self.path)
+        self.cache._write_meta(self.query, {
+            'query': normalize_query(self.query),
+            'fetched_at': time.time(),
+            'size': self.size,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        })
+        self.cache.evict()
@@ -0,0 +1,166 @@
+"""Pack every route's ways and stops into one compact binary for the map.
+
+route-data/geometry-pack/routes.bin holds one block per relation; index.json
+maps relationId -> [offset, length, CRC-32] so the site fetches a single route
+with an HTTP Range request. index.json also carries a hash of routes.bin,
+which the site puts in the routes.bin URL so caches never pair an index with
+a pack from another build; the block CRC catches any mismatch that slips
+through. A block is a sequence of unsigned LEB128 varints:
+
+  way count, then per way: point count, points
+  stop count, then per stop: point, name length, UTF-8 name bytes
+  endstop count, then per endstop: the same as a stop
+
+Points are lon/lat quantized to 1e-6 degrees (about 0.1 m) and stored as
+zigzag-encoded deltas from the previous point of the block.
+"""
+import hashlib
+import json
+import os
+import zlib
+from route_pipeline import DATA_DIR, ROUTE_DATA_DIR
+
+OUTPUT_DIR = os.path.join(DATA_DIR, 'geometry-pack')
+FORMAT_VERSION = 2
+SCALE = 1000000
+STOP_FILES = ['stops.geojson', 'endstops.geojson']
+
+def write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+def unzigzag(value):
+    return value >> 1 if value % 2 == 0 else -((value + 1) >> 1)
+
+class BlockWriter:
+    def __init__(self):
+        self.out = bytearray()
+        self.last = (0, 0)
+
+    def varint(self, value):
+        write_varint(self.out, value)
+
+    def point(self, lon, lat):
+        x, y = round(lon * SCALE), round(lat * SCALE)
+        self.varint(zigzag(x - self.last[0]))
+        self.varint(zigzag(y - self.last[1]))
+        self.last = (x, y)
+
+    def text(self, value):
+        raw = (value or '').encode('utf-8')
+        self.varint(len(raw))
+        self.out.extend(raw)
+
+def load_features(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['features']
+
+def pack_route(route_dir):
+    block = BlockWriter()
+
+    lines = []
+    for feature in load_features(os.path.join(route_dir, 'ways.geojson')):
+        geometry = feature['geometry']
+        if geometry['type'] == 'LineString':
+            lines.append(geometry['coordinates'])
+        elif geometry['type'] == 'MultiLineString':
+            lines.extend(geometry['coordinates'])
+    block.varint(len(lines))
+    for line in lines:
+        block.varint(len(line))
+        for lon, lat in line:
+            block.point(lon, lat)
+
+    for filename in STOP_FILES:
+        stops = [
+            feature for feature in load_features(os.path.join(route_dir, filename))
+            if feature['geometry']['type'] == 'Point'
+        ]
+        block.varint(len(stops))
+        for stop in stops:
+            lon, lat = stop['geometry']['coordinates'][:2]
+            block.point(lon, lat)
+            block.text(stop['properties'].get('name'))
+
+    return bytes(block.out)
+
+def unpack_route(data):
+    """Decode one block back to {'ways': [[(lon, lat), ...]], 'stops': [...], 'endstops': [...]}."""
+    pos = 0
+    last = [0, 0]
+
+    def point():
+        nonlocal pos
+        dx, pos = read_varint(data, pos)
+        dy, pos = read_varint(data, pos)
+        last[0] += unzigzag(dx)
+        last[1] += unzigzag(dy)
+        return (last[0] / SCALE, last[1] / SCALE)
+
+    route = {'ways': []}
+    way_count, pos = read_varint(data, pos)
+    for _ in range(way_count):
+        point_count, pos = read_varint(data, pos)
+        route['ways'].append([point() for _ in range(point_count)])
+
+    for key in ('stops', 'endstops'):
+        stops = []
+        stop_count, pos = read_varint(data, pos)
+        for _ in range(stop_count):
+            coords = point()
+            length, pos = read_varint(data, pos)
+            stops.append({'coordinates': coords, 'name': data[pos:pos + length].decode('utf-8') or None})
+            pos += length
+        route[key] = stops
+    return route
+
+def main():
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    relation_ids = sorted(
+        (name for name in os.listdir(ROUTE_DATA_DIR) if os.path.isdir(os.path.join(ROUTE_DATA_DIR, name))),
+        key=int
+    )
+
+    index = {}
+    geojson_bytes = 0
+    digest = hashlib.sha256()
+    with open(os.path.join(OUTPUT_DIR, 'routes.bin'), 'wb') as f:
+        offset = 0
+        for relation_id in relation_ids:
+            route_dir = os.path.join(ROUTE_DATA_DIR, relation_id)
+            block = pack_route(route_dir)
+            f.write(block)
+            digest.update(block)
+            index[relation_id] = [offset, len(block), zlib.crc32(block)]
+            offset += len(block)
+            geojson_bytes += sum(
+                os.path.getsize(os.path.join(route_dir, name))
+                for name in ['ways.geojson'] + STOP_FILES
+                if os.path.exists(os.path.join(route_dir, name))
+            )
+
+    with open(os.path.join(OUTPUT_DIR, 'index.json'), 'w') as f:
+        json.dump({'format': FORMAT_VERSION, 'scale': SCALE, 'hash': digest.hexdigest()[:16], 'routes': index},
+                  f, separators=(',', ':'))
+
+    print(f"Packed {len(index)} routes: {offset / 1024:.0f} KB (GeoJSON: {geojson_bytes / 1024:.0f} KB)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Plan a journey on the compiled transfer graph.
+
+Places are OSM stop node ids or "lat,lon" pairs. Southern latitudes start
+with a minus, so put -- before them:
+  python action-scripts/plan-journey.py -- -6.9147,107.6098 -6.8915,107.6107
+"""
+import argparse
+import json
+import time
+from transit_graph import GRAPH_PATH, JourneyPlanner
+
+def parse_place(value):
+    if ',' in value:
+        lat, lon = (float(part) for part in value.split(','))
+        return (lon, lat)
+    return int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest journey between two stops or points")
+    parser.add_argument('origin', help="stop id or lat,lon")
+    parser.add_argument('destination', help="stop id or lat,lon")
+    parser.add_argument('--graph', default=GRAPH_PATH, help=f"compiled graph (default: {GRAPH_PATH})")
+    parser.add_argument('--json', action='store_true', help="print the journey as JSON")
+    args = parser.parse_args()
+
+    places = []
+    for value in (args.origin, args.destination):
+        try:
+            places.append(parse_place(value))
+        except ValueError:
+            parser.error(f"expected a stop id or lat,lon, got {value!r}")
+
+    planner = JourneyPlanner.load(args.graph)
+    for place in places:
+        if not isinstance(place, tuple) and place not in planner.stop_by_id:
+            parser.error(f"unknown stop {place}")
+    start_time = time.perf_counter()
+    journey = planner.plan(*places)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    if args.json:
+        print(json.dumps(journey, ensure_ascii=False, indent=2))
+        return
+    if journey is None:
+        print(f"No journey found ({elapsed_ms:.0f} ms)")
+        return
+
+    print(f"Journey of {journey['duration_s'] / 60:.0f} min, found in {elapsed_ms:.0f} ms")
+    if journey['access_s']:
+        print(f"  Walk {journey['access_s'] / 60:.0f} min to the first stop")
+    for leg in journey['legs']:
+        if leg['mode'] == 'walk':
+            print(f"  Walk from {leg['from']['name'] or leg['from']['id']} to {leg['to']['name'] or leg['to']['id']} "
+                  f"({leg['duration_s'] / 60:.0f} min)")
+        else:
+            print(f"  Wait about {leg['wait_s'] / 60:.0f} min at {leg['from']['name'] or leg['from']['id']}")
+            print(f"  Take {leg['route']['name']} from {leg['from']['name'] or leg['from']['id']} "
+                  f"to {leg['to']['name'] or leg['to']['id']}, {leg['stops']} stops ({leg['duration_s'] / 60:.0f} min)")
+    if journey['egress_s']:
+        print(f"  Walk {journey['egress_s'] / 60:.0f} min to the destination")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from metrics import run_metrics
+from stitch import chains_geometry, stitch_features
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, '..', 'route-data')
+ROUTE_DATA_DIR = os.path.join(DATA_DIR, 'geojson')
+ROUTES_JSON_PATH = os.path.join(DATA_DIR, 'routes.json')
+MANIFEST_PATH = os.path.join(DATA_DIR, 'convert-manifest.json')
+
+class RouteData:
+    """One route from routes.json together with its parsed GeoJSON files."""
+
+    def __init__(self, category, route, files):
+        self.category = category['name']
+        self.relation_id = route['relationId']
+        self.name = route['name']
+        self.color = route['color']
+        self.route = route
+        self.files = files
+        self._stitched = None
+
+    @property
+    def features(self):
+        # Same order as the converters always used: os.listdir order, then file order
+        merged_features = []
+        for filename, data in self.files:
+            if data['type'] == 'FeatureCollection':
+                merged_features.extend(data['features'])
+            elif data['type'] == 'Feature':
+                merged_features.append(data)
+        return merged_features
+
+    @property
+    def stitched(self):
+        """(chains, gaps) of the route's ways joined end to end; computed once and shared by the writers."""
+        if self._stitched is None:
+            chains, gaps = stitch_features(self.features)
+            if gaps:
+                largest = max(gap['distance_m'] for gap in gaps)
+                print(f"{self.name}: {len(gaps)} gap(s) between ways, largest {largest} m")
+            self._stitched = chains, gaps
+        return self._stitched
+
+    def line_feature(self, properties):
+        """The stitched ways as a single LineString/MultiLineString feature, or None."""
+        chains, gaps = self.stitched
+        if not chains:
+            return None
+        return {'type': 'Feature', 'geometry': chains_geometry(chains), 'properties': properties}
+
+    @property
+    def point_features(self):
+        return [f for f in self.features if f['geometry']['type'] == 'Point']
+
+def load_routes(routes_json_path=ROUTES_JSON_PATH):
+    with open(routes_json_path, 'r') as f:
+        return json.load(f)
+
+def iter_routes(routes_data):
+    for category in routes_data['categories']:
+        for route in category['routes']:
+            yield category, route
+
+def read_route_files(route_dir):
+    files = []
+    for filename in os.listdir(route_dir):
+        if filename.endswith('.geojson'):
+            with open(os.path.join(route_dir, filename), 'rb') as f:
+                files.append((filename, f.read()))
+    return files
+
+def load_route_files(route_dir):
+    return [(filename, json.loads(raw)) for filename, raw in read_route_files(route_dir)]
+
+def load_route(category, route, route_data_dir=ROUTE_DATA_DIR):
+    route_dir = os.path.join(route_data_dir, route['relationId'])
+    if not os.path.exists(route_dir):
+        print(f"Skipping missing directory: {route_dir}")
+        return None
+    return RouteData(category, route, load_route_files(route_dir))
+
+def route_input_hash(route, raw_files):
+    """Hash of the routes.json entry plus every GeoJSON file of the route."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(route, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    for filename, raw in sorted(raw_files):
+        digest.update(filename.encode('utf-8'))
+        digest.update(hashlib.sha256(raw).digest())
+    return digest.hexdigest()
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(manifest, manifest_path=MANIFEST_PATH):
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def remove_outputs(output_dir, outputs):
+    for output in outputs:
+        path = os.path.join(output_dir, output)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+
+def is_up_to_date(writer, entry, digest):
+    if entry is None or entry['hash'] != digest:
+        return False
+    # Writers bump their version when their output changes for the same input
+    if entry.get('version', 1) != writer.version:
+        return False
+    # Outputs deleted by hand are rebuilt even if the inputs didn't change
+    return all(os.path.exists(os.path.join(writer.output_dir, output)) for output in entry['outputs'])
+
+def convert_route(category, route, route_dir, writers, entries, force=False):
+    """Rebuild one route for every writer whose manifest entry is stale.
+
+    Runs inside a worker process when --jobs > 1, so it only takes and returns
+    picklable data. Errors are collected per writer instead of raised.
+    """
+    outputs = {}
+    errors = []
+    digest = None
+    try:
+        raw_files = read_route_files(route_dir)
+        digest = route_input_hash(route, raw_files)
+        pending = [
+            writer for writer in writers
+            if force or not is_up_to_date(writer, entries.get(writer.name), digest)
+        ]
+        if pending:
+            files = [(filename, json.loads(raw)) for filename, raw in raw_files]
+            route_data = RouteData(category, route, files)
+    except Exception as e:
+        return digest, outputs, [f"{route['relationId']} ({route['name']}): {e}"]
+
+    for writer in pending:
+        try:
+            outputs[writer.name] = writer.write(route_data) or []
+        except Exception as e:
+            errors.append(f"{route['relationId']} ({route['name']}) -> {writer.name}: {e}")
+    return digest, outputs, errors
+
+def run(writers, routes_json_path=ROUTES_JSON_PATH, route_data_dir=ROUTE_DATA_DIR,
+        manifest_path=MANIFEST_PATH, force=False, jobs=1):
+    """Load every changed route once and hand it to each writer that needs it.
+
+    The manifest keeps, per writer and relationId, the input hash and the files
+    written, so unchanged routes are skipped and outputs of routes that left
+    routes.json (or were renamed) are deleted. With jobs > 1 routes are
+    converted in a process pool; results are merged back in routes.json order.
+    Returns the list of per-route errors.
+    """
+    routes_data = load_routes(routes_json_path)
+    manifest = load_manifest(manifest_path)
+    for writer in writers:
+        manifest.setdefault(writer.name, {})
+
+    relation_ids = set()
+    tasks = []
+    for category, route in iter_routes(routes_data):
+        relation_id = route['relationId']
+        relation_ids.add(relation_id)
+        route_dir = os.path.join(route_data_dir, relation_id)
+
+        if not os.path.exists(route_dir):
+            print(f"Skipping missing directory: {route_dir}")
+            continue
+
+        entries = {writer.name: manifest[writer.name].get(relation_id) for writer in writers}
+        tasks.append((category, route, route_dir, writers, entries, force))
+
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(convert_route, *zip(*tasks)))
+    else:
+        results = [convert_route(*task) for task in tasks]
+
+    output_dirs = {writer.name: writer.output_dir for writer in writers}
+    versions = {writer.name: writer.version for writer in writers}
+    built = skipped = removed = 0
+    errors = []
+    for (category, route, *_), (digest, outputs, route_errors) in zip(tasks, results):
+        relation_id = route['relationId']
+        errors.extend(route_errors)
+        if not outputs:
+            if not route_errors:
+                skipped += 1
+            continue
+        for writer_name, written in outputs.items():
+            run_metrics.count('files_written', len(written))
+            previous = manifest[writer_name].get(relation_id)
+            if previous:
+                remove_outputs(output_dirs[writer_name], [o for o in previous['outputs'] if o not in written])
+            manifest[writer_name][relation_id] = {'hash': digest, 'outputs': written, 'version': versions[writer_name]}
+        built += 1
+
+    for writer in writers:
+        entries = manifest[writer.name]
+        for relation_id in [rid for rid in entries if rid not in relation_ids]:
+            remove_outputs(writer.output_dir, entries.pop(relation_id)['outputs'])
+            removed += 1
+
+    save_manifest(manifest, manifest_path)
+    run_metrics.count('files_skipped', skipped)
+    print(f"Routes rebuilt: {built}, unchanged: {skipped}, outputs removed: {removed}")
+    if errors:
+        print(f"{len(errors)} route(s) failed:")
+        for error in errors:
+            print(f"  {error}")
+    return errors
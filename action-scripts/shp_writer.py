@@ -0,0 +1,106 @@
+import os
+import geopandas as gpd
+
+SHP_EXTENSIONS = ['.shp', '.shx', '.dbf', '.prj', '.cpg']
+
+def sanitize_filename(name):
+    return "".join([c if c.isalnum() or c in (' ', '-', '_') else '_' for c in name]).strip()
+
+def sanitize_ungrouped_filename(name):
+    return "".join([c if c.isalnum() or c in (' ', '-', '–') else '-' for c in name]).strip()
+
+def write_qml(path, color_hex, stroke_width=0.86):
+    with open(path, 'w') as f:
+        f.write(f"""<?xml version="1.0" encoding="UTF-8"?>
+<qgis styleCategories="Symbology" version="3.16">
+  <renderer-v2 type="singleSymbol">
+    <symbol type="line" name="">
+      <layer pass="0" class="SimpleLine">
+        <prop k="color" v="{color_hex}"/>
+        <prop k="width" v="{stroke_width}"/>
+        <prop k="capstyle" v="square"/>
+        <prop k="joinstyle" v="miter"/>
+      </layer>
+    </symbol>
+  </renderer-v2>
+  <layerGeometryType>1</layerGeometryType>
+</qgis>""")
+
+def with_route_properties(feature, route_name, color):
+    # Copy instead of updating in place, other writers see the same features
+    props = dict(feature['properties'])
+    props.update({
+        "route_name": route_name,
+        "color": color,
+        "source": "Transport for Bandung"
+    })
+    return {'type': 'Feature', 'geometry': feature['geometry'], 'properties': props}
+
+def route_line_feature(route, color):
+    # All ways of the route stitched into one record; per-way OSM tags don't apply to it
+    line_feature = route.line_feature({'parts': len(route.stitched[0])})
+    if line_feature is None:
+        return None
+    return with_route_properties(line_feature, route.name, color)
+
+def save_features(features, path):
+    gdf = gpd.GeoDataFrame.from_features(features)
+    gdf.crs = 'EPSG:4326'  # WGS84 coordinate system
+    gdf.to_file(path)
+
+class ShpWriter:
+    """Writes route_lines.shp and stops.shp into one folder per route (shp-named)."""
+
+    version = 2
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.name = os.path.basename(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, route):
+        line_feature = route_line_feature(route, route.color)
+        line_features = [line_feature] if line_feature else []
+        point_features = [
+            with_route_properties(feature, route.name, route.color) for feature in route.point_features
+        ]
+
+        sanitized_name = sanitize_filename(route.name)
+        route_output_dir = os.path.join(self.output_dir, sanitized_name)
+        os.makedirs(route_output_dir, exist_ok=True)
+
+        if line_features:
+            save_features(line_features, os.path.join(route_output_dir, 'route_lines.shp'))
+        if point_features:
+            save_features(point_features, os.path.join(route_output_dir, 'stops.shp'))
+        return [sanitized_name]
+
+class UngroupedShpWriter:
+    """Writes one flat <route>.shp of route lines plus a matching QGIS .qml style (shp-named-ungrouped)."""
+
+    version = 2
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.name = os.path.basename(output_dir)
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, route):
+        color_hex = f"#{route.color.lstrip('#').upper()}"
+        line_feature = route_line_feature(route, color_hex)
+        if not line_feature:
+            return []
+
+        filename_base = sanitize_ungrouped_filename(route.name.replace(":", " -"))
+        shapefile_path = os.path.join(self.output_dir, f"{filename_base}.shp")
+        qml_path = os.path.join(self.output_dir, f"{filename_base}.qml")
+
+        save_features([line_feature], shapefile_path)
+        write_qml(qml_path, color_hex)
+
+        print(f"Saved: {shapefile_path}")
+        print(f"Style: {qml_path}")
+        return [
+            f"{filename_base}{ext}" for ext in SHP_EXTENSIONS + ['.qml']
+            if os.path.exists(os.path.join(self.output_dir, f"{filename_base}{ext}"))
+        ]
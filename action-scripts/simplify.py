@@ -0,0 +1,64 @@
+"""Topology-preserving line simplification with tolerances in metres.
+
+Coordinates are projected to a local equirectangular plane around the route
+(good to well under a metre across Bandung) and the route's lines are
+simplified there together with shapely's preserve_topology mode (GEOS's
+topology-preserving Douglas-Peucker). Simplified lines don't cross each
+other or themselves where the originals didn't, and the first and last
+vertex of every line are kept, so lines that met at an endpoint still meet.
+The result uses the original lon/lat of the vertices that were kept.
+"""
+import math
+import numpy as np
+
+EARTH_RADIUS = 6371008.8
+
+class LocalProjection:
+    """Projects lon/lat to metres on a plane tangent at the given latitude (forward only)."""
+
+    def __init__(self, lat0):
+        self.kx = math.radians(1) * EARTH_RADIUS * math.cos(math.radians(lat0))
+        self.ky = math.radians(1) * EARTH_RADIUS
+
+    @classmethod
+    def for_lines(cls, lines):
+        lats = [lat for line in lines for _, lat in line]
+        return cls(sum(lats) / len(lats) if lats else 0.0)
+
+    def forward(self, coords):
+        xy = np.asarray(coords, dtype=float)[:, :2].copy()
+        xy[:, 0] *= self.kx
+        xy[:, 1] *= self.ky
+        return xy
+
+def simplify_lines(lines, tolerance, projection=None):
+    """Simplify a list of [lon, lat] lines together, without changing their topology.
+
+    Returns (simplified lines, vertices before, vertices after, max deviation in metres).
+    """
+    # Only the converters simplify; the other users of LocalProjection don't need shapely
+    import shapely
+
+    projection = projection or LocalProjection.for_lines(lines)
+    projected = [projection.forward(line) for line in lines]
+    # One geometry, so no simplified line may cross or touch another it didn't before
+    collection = shapely.multilinestrings([shapely.linestrings(xy) for xy in projected])
+    result = shapely.simplify(collection, tolerance, preserve_topology=True)
+    parts = shapely.get_parts(result)
+    if len(parts) != len(lines):
+        raise ValueError(f"Simplifying {len(lines)} lines gave {len(parts)}")
+
+    simplified = []
+    before = after = 0
+    deviation = 0.0
+    for line, xy, part in zip(lines, projected, parts):
+        # The simplified vertices are a subset of the projected ones; keep the originals
+        original = {(x, y): point for (x, y), point in zip(xy.tolist(), line)}
+        kept = shapely.get_coordinates(part).tolist()
+        simplified.append([original[x, y] for x, y in kept])
+        before += len(line)
+        after += len(kept)
+        if len(kept) < len(line):
+            distances = shapely.distance(shapely.points(xy), part)
+            deviation = max(deviation, float(distances.max()))
+    return simplified, before, after, deviation
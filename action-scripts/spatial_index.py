@@ -0,0 +1,130 @@
+"""Grid index over bus stops and route ways for proximity queries in metres.
+
+Stops are bucketed by the grid cell they fall in, route way segments by every
+cell their bounding box touches. A query only measures the items in the cells
+around it, so matching every stop against every route stays a matter of
+seconds instead of stops x vertices distance computations.
+"""
+import json
+import math
+import os
+from collections import defaultdict
+import numpy as np
+from route_pipeline import ROUTE_DATA_DIR, iter_routes
+from simplify import LocalProjection
+from stitch import feature_lines
+
+# Roughly a street block; queries look at the cells within their radius
+CELL_SIZE = 100
+
+class TransitIndex:
+    """Stops and route segments of one area, projected to a shared metric plane."""
+
+    def __init__(self, lat0, cell_size=CELL_SIZE):
+        self.projection = LocalProjection(lat0)
+        self.cell_size = cell_size
+        self.stops = []
+        self.stop_xy = np.empty((0, 2))
+        self.stop_cells = defaultdict(list)
+        self.segment_starts = np.empty((0, 2))
+        self.segment_ends = np.empty((0, 2))
+        self.segment_routes = np.empty(0, dtype=np.int64)
+        self.segment_cells = defaultdict(list)
+
+    @classmethod
+    def from_stops(cls, stops, cell_size=CELL_SIZE):
+        """Index a list of stop features; the projection is centred on them."""
+        lats = [stop['geometry']['coordinates'][1] for stop in stops]
+        index = cls(sum(lats) / len(lats) if lats else 0.0, cell_size)
+        index.add_stops(stops)
+        return index
+
+    def cell(self, x, y):
+        return (int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size)))
+
+    def cells_around(self, x, y, radius):
+        x0, y0 = self.cell(x - radius, y - radius)
+        x1, y1 = self.cell(x + radius, y + radius)
+        return [(cx, cy) for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1)]
+
+    def project(self, lon, lat):
+        return self.projection.forward([[lon, lat]])[0]
+
+    def add_stops(self, stops):
+        first = len(self.stops)
+        self.stops.extend(stops)
+        xy = self.projection.forward([stop['geometry']['coordinates'] for stop in stops]) if stops else np.empty((0, 2))
+        self.stop_xy = np.vstack([self.stop_xy, xy])
+        for i, (x, y) in enumerate(xy, first):
+            self.stop_cells[self.cell(x, y)].append(i)
+
+    def add_route(self, relation_id, lines):
+        """Index the segments of a route's lines under its relation id."""
+        starts = []
+        ends = []
+        for line in lines:
+            if len(line) < 2:
+                continue
+            xy = self.projection.forward(line)
+            starts.append(xy[:-1])
+            ends.append(xy[1:])
+        if not starts:
+            return
+        starts = np.vstack(starts)
+        ends = np.vstack(ends)
+
+        first = len(self.segment_starts)
+        lows = np.floor(np.minimum(starts, ends) / self.cell_size).astype(int)
+        highs = np.floor(np.maximum(starts, ends) / self.cell_size).astype(int)
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(lows.tolist(), highs.tolist()), first):
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.segment_cells[(cx, cy)].append(i)
+
+        self.segment_starts = np.vstack([self.segment_starts, starts])
+        self.segment_ends = np.vstack([self.segment_ends, ends])
+        self.segment_routes = np.concatenate([self.segment_routes, np.full(len(starts), int(relation_id))])
+
+    def add_routes_from_data(self, routes_data, route_data_dir=ROUTE_DATA_DIR):
+        """Index the ways of every route in routes.json that has GeoJSON on disk."""
+        for category, route in iter_routes(routes_data):
+            path = os.path.join(route_data_dir, route['relationId'], 'ways.geojson')
+            if not os.path.exists(path):
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                self.add_route(route['relationId'], feature_lines(json.load(f)['features']))
+
+    def stop_distances(self, candidates, x, y):
+        candidates = np.asarray(sorted(candidates), dtype=int)
+        if len(candidates) == 0:
+            return candidates, np.empty(0)
+        return candidates, np.hypot(*(self.stop_xy[candidates] - (x, y)).T)
+
+    def stops_within(self, lon, lat, radius):
+        """[(stop, distance)] for the stops within radius metres of the point, nearest first."""
+        x, y = self.project(lon, lat)
+        candidates = {i for cell in self.cells_around(x, y, radius) for i in self.stop_cells.get(cell, [])}
+        indices, distances = self.stop_distances(candidates, x, y)
+        order = np.argsort(distances, kind='stable')
+        return [(self.stops[indices[i]], float(distances[i])) for i in order if distances[i] <= radius]
+
+    def segment_distances(self, segments, x, y):
+        starts = self.segment_starts[segments]
+        d = self.segment_ends[segments] - starts
+        length2 = np.einsum('ij,ij->i', d, d)
+        t = np.clip(np.einsum('ij,ij->i', (x, y) - starts, d) / np.where(length2 == 0, 1, length2), 0, 1)
+        nearest = starts + t[:, None] * d
+        return np.hypot(*(nearest - (x, y)).T)
+
+    def routes_near(self, lon, lat, radius):
+        """{relationId: distance} for every route passing within radius metres of the point."""
+        x, y = self.project(lon, lat)
+        segments = sorted({i for cell in self.cells_around(x, y, radius) for i in self.segment_cells.get(cell, [])})
+        if not segments:
+            return {}
+        distances = self.segment_distances(np.asarray(segments), x, y)
+        routes = {}
+        for relation_id, distance in zip(self.segment_routes[segments].tolist(), distances.tolist()):
+            if distance <= radius and distance < routes.get(relation_id, math.inf):
+                routes[relation_id] = distance
+        return routes
@@ -0,0 +1,108 @@
+"""Join a route's OSM ways into as few ordered lines as possible.
+
+update-routes.js fetches ways with `way(r); out geom;`, which returns them by
+way id, not in travel order, and with arbitrary direction. Ways sharing an
+endpoint are found through a hash index on endpoint coordinates and appended
+head to tail, reversed where needed. Whatever can't be reached that way starts
+a new line: from a junction already on the route if possible (a branch), else
+from the endpoint nearest to where the previous line stopped (a gap).
+"""
+import math
+from collections import defaultdict
+
+EARTH_RADIUS = 6371008.8
+LINE_TYPES = ['LineString', 'MultiLineString']
+
+def endpoint_key(coord):
+    # OSM ways that share a node carry the exact same coordinates
+    return (round(coord[0], 7), round(coord[1], 7))
+
+def distance_m(a, b):
+    """Equirectangular distance in metres, plenty for gaps within a city."""
+    lat = math.radians((a[1] + b[1]) / 2)
+    dx = math.radians(b[0] - a[0]) * math.cos(lat)
+    dy = math.radians(b[1] - a[1])
+    return EARTH_RADIUS * math.hypot(dx, dy)
+
+def feature_lines(features):
+    lines = []
+    for feature in features:
+        geometry = feature['geometry']
+        if geometry['type'] == 'LineString':
+            lines.append(geometry['coordinates'])
+        elif geometry['type'] == 'MultiLineString':
+            lines.extend(geometry['coordinates'])
+    return lines
+
+def stitch_lines(lines):
+    """Return (chains, gaps).
+
+    chains is a list of coordinate lists covering every input line once.
+    gaps lists, for each chain that connects to nothing before it, where the
+    previous chain ended, where this one starts and the distance in metres.
+    """
+    lines = [line for line in lines if len(line) >= 2]
+    index = defaultdict(list)
+    for i, line in enumerate(lines):
+        index[endpoint_key(line[0])].append(i)
+        index[endpoint_key(line[-1])].append(i)
+
+    used = [False] * len(lines)
+    visited = set()
+
+    def take(i, key):
+        used[i] = True
+        line = lines[i]
+        visited.add(endpoint_key(line[0]))
+        visited.add(endpoint_key(line[-1]))
+        return list(line) if endpoint_key(line[0]) == key else line[::-1]
+
+    def extend(chain):
+        while True:
+            key = endpoint_key(chain[-1])
+            following = next((i for i in index[key] if not used[i]), None)
+            if following is None:
+                return
+            chain.extend(take(following, key)[1:])
+
+    def unused_endpoints():
+        for i, line in enumerate(lines):
+            if not used[i]:
+                yield i, endpoint_key(line[0])
+                yield i, endpoint_key(line[-1])
+
+    chains = []
+    gaps = []
+    while not all(used):
+        gap = None
+        if not chains:
+            # Begin at a dead end if the route has one, so a one-way trip reads start to finish
+            start = next(((i, key) for i, key in unused_endpoints() if len(index[key]) == 1), None)
+            start = start or next(unused_endpoints())
+        else:
+            start = next(((i, key) for i, key in unused_endpoints() if key in visited), None)
+            if start is None:
+                end = chains[-1][-1]
+                start = min(unused_endpoints(), key=lambda item: distance_m(end, item[1]))
+                gap = {'from': list(end[:2]), 'to': list(start[1]), 'distance_m': round(distance_m(end, start[1]), 1)}
+
+        chain = take(*start)
+        extend(chain)
+        # The start may not be a dead end; pick up what lies behind it too
+        chain.reverse()
+        extend(chain)
+        chain.reverse()
+
+        chains.append(chain)
+        if gap:
+            gaps.append(gap)
+    return chains, gaps
+
+def stitch_features(features):
+    """Stitch the line features of a route; returns (chains, gaps)."""
+    return stitch_lines(feature_lines(features))
+
+def chains_geometry(chains):
+    if len(chains) == 1:
+        return {'type': 'LineString', 'coordinates': chains[0]}
+    return {'type': 'MultiLineString', 'coordinates': chains}
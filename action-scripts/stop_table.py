@@ -0,0 +1,182 @@
+"""Bus stops as columns, for classifying and summarising them in bulk.
+
+StopTable holds one numpy array per stop property and the stop -> route
+pairs as two flat arrays. classify_stops() gives every stop its icon category
+with a handful of array operations: the substring rules only run once per
+distinct shelter/pole value, of which there are a few dozen however many
+stops there are. stop_report() counts with bincount/unique over the columns,
+so a bounding box ten times the size costs little more than loading it.
+
+  python action-scripts/stop_table.py    # rebuild the report from all_bus_stops.geojson
+"""
+import csv
+import json
+import os
+import numpy as np
+from route_pipeline import DATA_DIR, iter_routes, load_routes
+
+STOPS_DIR = os.path.join(DATA_DIR, 'bus-stop')
+STOPS_PATH = os.path.join(STOPS_DIR, 'all_bus_stops.geojson')
+REPORT_NAME = 'stop-report'
+AMENITIES = ['lit', 'bench', 'bin']
+# Icon categories; the shelter/pole combination picks one
+CATEGORIES = [
+    '1_shelter_yes_pole_none',
+    '2_shelter_none_pole_sign',
+    '3_shelter_none_pole_totem',
+    '4_shelter_none_pole_flag',
+    '5_shelter_yes_pole_sign',
+    '6_shelter_yes_pole_totem',
+    '7_shelter_yes_pole_flag',
+    '8_shelter_none_pole_none',
+]
+
+def tag_column(values):
+    """Tag values as a string array, '' where the tag is missing."""
+    return np.array(['' if value is None else str(value) for value in values], dtype=str)
+
+def value_mask(column, predicate):
+    """predicate(values) for every row, evaluated once per distinct value in the column."""
+    values, inverse = np.unique(column, return_inverse=True)
+    return predicate(values)[inverse.reshape(-1)]
+
+def classify_stops(shelter, pole):
+    """Category of every stop from its shelter and pole tags (string arrays, '' for missing).
+
+    A pole tag containing "yes" or "traffic_sign" means a sign, else "totem" a
+    totem, else "flag" a flag, checked in that order and ignoring case.
+    """
+    def pole_kind(values):
+        values = np.char.lower(values)
+        sign = (np.char.find(values, 'yes') >= 0) | (np.char.find(values, 'traffic_sign') >= 0)
+        totem = np.char.find(values, 'totem') >= 0
+        flag = np.char.find(values, 'flag') >= 0
+        return np.select([sign, totem, flag], [1, 2, 3], 0)
+
+    sheltered = value_mask(shelter, lambda values: np.char.lower(values) == 'yes')
+    # Rows: no shelter, shelter; columns: no pole, sign, totem, flag
+    lookup = np.array([[7, 1, 2, 3], [0, 4, 5, 6]])
+    return np.array(CATEGORIES)[lookup[sheltered.astype(int), value_mask(pole, pole_kind)]]
+
+class StopTable:
+    """Stop properties as columns; route_stop/route_id pair every stop with each of its routes."""
+
+    def __init__(self, features):
+        props = [feature['properties'] for feature in features]
+        self.ids = np.array([p['id'] for p in props], dtype=np.int64)
+        self.names = tag_column(p.get('name') for p in props)
+        self.tags = {key: tag_column(p.get(key) for p in props) for key in ['shelter', 'pole'] + AMENITIES}
+        self.category = tag_column(p.get('category') for p in props)
+        self.proximity = np.array([p.get('routes_source') == 'proximity' for p in props], dtype=bool)
+        route_counts = np.array([len(p.get('routes') or ()) for p in props], dtype=np.int64)
+        self.route_stop = np.repeat(np.arange(len(props)), route_counts)
+        self.route_id = np.array([r for p in props for r in p.get('routes') or ()], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def classify(self):
+        self.category = classify_stops(self.tags['shelter'], self.tags['pole'])
+        return self.category
+
+def amenity_coverage(column):
+    """{'yes': n, 'no': n, 'missing': n, 'other': n} for one amenity column."""
+    values, counts = np.unique(column, return_counts=True)
+    values = np.char.lower(values)
+    coverage = {key: int(counts[values == value].sum()) for key, value in (('yes', 'yes'), ('no', 'no'), ('missing', ''))}
+    coverage['other'] = len(column) - sum(coverage.values())
+    return coverage
+
+def stop_report(table, routes_data):
+    """Category distribution, amenity coverage and stops per route and route category."""
+    categories, inverse, counts = np.unique(table.category, return_inverse=True, return_counts=True)
+    category_counts = dict(zip(categories.tolist(), counts.tolist()))
+    sheltered = (np.char.find(categories, 'shelter_yes') >= 0)[inverse.reshape(-1)]
+    amenity_yes = {key: value_mask(table.tags[key], lambda values: np.char.lower(values) == 'yes')
+                   for key in AMENITIES}
+
+    # Per route: stops, and how many of them are sheltered or have each amenity
+    route_ids, pair_route = np.unique(table.route_id, return_inverse=True)
+    pair_route = pair_route.reshape(-1)
+
+    def per_route(mask):
+        return np.bincount(pair_route, weights=mask[table.route_stop], minlength=len(route_ids)).astype(int)
+
+    route_stops = np.bincount(pair_route, minlength=len(route_ids))
+    route_sheltered = per_route(sheltered)
+    route_amenities = {key: per_route(amenity_yes[key]) for key in AMENITIES}
+
+    known = {}
+    listed_routes = {}
+    for category, route in iter_routes(routes_data):
+        known.setdefault(int(route['relationId']), (category['name'], route['name']))
+        listed_routes.setdefault(category['name'], set()).add(route['relationId'])
+    route_category_names = list(listed_routes)
+    routes = []
+    for k, relation_id in enumerate(route_ids.tolist()):
+        route_category, name = known.get(relation_id, ('', ''))
+        routes.append({
+            'relationId': relation_id,
+            'name': name,
+            'category': route_category,
+            'stops': int(route_stops[k]),
+            'sheltered': int(route_sheltered[k]),
+            **{key: int(route_amenities[key][k]) for key in AMENITIES},
+        })
+
+    # Per route category: distinct stops served by any of its routes, counted
+    # over the distinct (category, stop) pairs; routes outside routes.json get -1
+    category_number = {name: i for i, name in enumerate(route_category_names)}
+    route_category = np.array([category_number.get(route['category'], -1) for route in routes], dtype=np.int64)
+    pair_category = route_category[pair_route]
+    known_pairs = pair_category >= 0
+    served = np.unique(pair_category[known_pairs] * len(table) + table.route_stop[known_pairs])
+    category_stops = np.bincount(served // max(len(table), 1), minlength=len(route_category_names))
+    category_routes_with_stops = np.bincount(route_category[route_category >= 0], minlength=len(route_category_names))
+
+    return {
+        'stops': len(table),
+        'stops_with_routes': int(len(np.unique(table.route_stop))),
+        'stops_matched_by_proximity': int(np.count_nonzero(table.proximity)),
+        'route_associations': int(len(table.route_id)),
+        'categories': {category: category_counts.get(category, 0) for category in CATEGORIES},
+        'sheltered': int(np.count_nonzero(sheltered)),
+        'amenities': {key: amenity_coverage(table.tags[key]) for key in AMENITIES},
+        'route_categories': [
+            {'category': name, 'routes': len(listed_routes[name]),
+             'routes_with_stops': int(category_routes_with_stops[i]), 'stops': int(category_stops[i])}
+            for i, name in enumerate(route_category_names)
+        ],
+        'routes_not_in_routes_json': int(np.count_nonzero(route_category < 0)),
+        'routes': routes,
+    }
+
+def write_csv(path, rows, fields):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, lineterminator='\n')
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_report(report, output_dir=STOPS_DIR):
+    """Write <REPORT_NAME>.json plus per-category and per-route CSVs; returns the JSON path."""
+    path = os.path.join(output_dir, f"{REPORT_NAME}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    total = report['stops'] or 1
+    write_csv(os.path.join(output_dir, f"{REPORT_NAME}-categories.csv"),
+              [{'category': c, 'stops': n, 'share': f"{n / total:.4f}"} for c, n in report['categories'].items()],
+              ['category', 'stops', 'share'])
+    write_csv(os.path.join(output_dir, f"{REPORT_NAME}-routes.csv"), report['routes'],
+              ['relationId', 'name', 'category', 'stops', 'sheltered'] + AMENITIES)
+    return path
+
+def main():
+    with open(STOPS_PATH, 'r', encoding='utf-8') as f:
+        table = StopTable(json.load(f)['features'])
+    # The saved file keeps the category but not the shelter and pole tags
+    report = stop_report(table, load_routes())
+    print(f"Wrote {write_report(report)}: {report['stops']} stops, {len(report['routes'])} routes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import json
+import math
+import os
+import numpy as np
+import shapely
+from shapely.geometry import MultiLineString
+
+# Tile coordinates run 0..EXTENT; BUFFER extra units on each side keep lines
+# from visibly stopping at tile edges
+EXTENT = 4096
+BUFFER = 64
+MIN_ZOOM = 10
+MAX_ZOOM = 16
+EARTH_RADIUS = 6378137.0
+WORLD_SIZE = 2 * math.pi * EARTH_RADIUS
+
+def to_mercator(coords):
+    lonlat = np.radians(np.asarray(coords, dtype=float)[:, :2])
+    return np.column_stack([
+        EARTH_RADIUS * lonlat[:, 0],
+        EARTH_RADIUS * np.log(np.tan(math.pi / 4 + lonlat[:, 1] / 2)),
+    ])
+
+def tile_size(z):
+    return WORLD_SIZE / (1 << z)
+
+def tile_origin(z, x, y):
+    """Top-left corner of a tile in Web Mercator metres."""
+    size = tile_size(z)
+    return -WORLD_SIZE / 2 + x * size, WORLD_SIZE / 2 - y * size
+
+def tile_at(z, mx, my):
+    size = tile_size(z)
+    last = (1 << z) - 1
+    x = min(max(int((mx + WORLD_SIZE / 2) // size), 0), last)
+    y = min(max(int((WORLD_SIZE / 2 - my) // size), 0), last)
+    return x, y
+
+def to_tile_coords(geometry, z, x, y):
+    """Move a Web Mercator geometry into the tile's 0..EXTENT grid, y pointing down."""
+    left, top = tile_origin(z, x, y)
+    scale = EXTENT / tile_size(z)
+    return shapely.transform(geometry, lambda c: np.round(np.column_stack([
+        (c[:, 0] - left) * scale,
+        (top - c[:, 1]) * scale,
+    ])))
+
+def line_tiles(geometry, z):
+    """Yield ((z, x, y), clipped geometry in tile coordinates) for every tile the lines cross."""
+    size = tile_size(z)
+    # Anything smaller than one tile unit is invisible at this zoom
+    simplified = shapely.simplify(geometry, size / EXTENT)
+    pad = size * BUFFER / EXTENT
+    minx, miny, maxx, maxy = simplified.bounds
+    x0, y0 = tile_at(z, minx - pad, maxy + pad)
+    x1, y1 = tile_at(z, maxx + pad, miny - pad)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            left, top = tile_origin(z, x, y)
+            clipped = shapely.clip_by_rect(simplified, left - pad, top - size - pad, left + size + pad, top + pad)
+            if clipped.is_empty:
+                continue
+            local = to_tile_coords(clipped, z, x, y)
+            if local.length == 0:
+                continue
+            yield (z, x, y), local
+
+def tile_lines(geometry):
+    parts = geometry.geoms if hasattr(geometry, 'geoms') else [geometry]
+    return [np.asarray(part.coords).astype(int).tolist() for part in parts if part.length > 0]
+
+def fragment_key(z, x, y):
+    return f"{z}/{x}/{y}"
+
+class TileFragmentWriter:
+    """Cuts each route into its vector tile pieces (tile-fragments/<relationId>.json).
+
+    Each tile maps to a list of lines, already clipped, simplified for the zoom
+    and in integer tile coordinates, so build-tiles.py only has to merge them
+    with the stops and encode. Only changed routes are cut again.
+    """
+
+    version = 1
+
+    def __init__(self, output_dir, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM):
+        self.output_dir = output_dir
+        self.name = os.path.basename(output_dir)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, route):
+        chains, gaps = route.stitched
+        if not chains:
+            print(f"No ways for {route.name}")
+            return []
+
+        geometry = MultiLineString([to_mercator(chain) for chain in chains])
+        tiles = {}
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            for (z, x, y), local in line_tiles(geometry, z):
+                tiles[fragment_key(z, x, y)] = tile_lines(local)
+
+        filename = f"{route.relation_id}.json"
+        with open(os.path.join(self.output_dir, filename), 'w') as f:
+            json.dump({
+                'properties': {
+                    'relationId': int(route.relation_id),
+                    'name': route.name,
+                    'ref': route.route.get('ref') or '',
+                    'color': route.color,
+                    'category': route.category,
+                },
+                'tiles': tiles,
+            }, f, separators=(',', ':'))
+        return [filename]
@@ -0,0 +1,382 @@
+"""Stop-to-stop transfer graph and journey planner.
+
+The graph has one node per stop and one per (route, stop) pair. Edges:
+
+  stop -> route stop        board, costs BOARDING_PENALTY (the average wait)
+  route stop -> next stop   ride along the route line at the route's speed
+  route stop -> stop        alight, free
+  stop -> stop              walk to any stop within WALK_RADIUS
+
+It is stored as CSR arrays (indptr, indices, weights in seconds) in one .npz
+file, so queries load a few numpy arrays instead of re-reading GeoJSON, and a
+Dijkstra search over the ~10k nodes answers in milliseconds.
+
+Stops on a route are ordered by how far along the stitched route line they
+sit. Overpass returns a relation's nodes by id, so the route files carry no
+order of their own. The direction comes from the route's endstops (the entry
+stop is listed first), else from the one-way streets it follows, else from
+the origin in its "A → B" name. A stop_position counts as the platform of
+the same name next to it, so each physical stop appears once per route.
+"""
+import heapq
+import json
+import os
+import numpy as np
+from route_pipeline import DATA_DIR, ROUTE_DATA_DIR, iter_routes, load_route_files
+from simplify import LocalProjection
+from spatial_index import TransitIndex
+from stitch import stitch_features
+
+GRAPH_PATH = os.path.join(DATA_DIR, 'transit-graph', 'graph.npz')
+STOPS_PATH = os.path.join(DATA_DIR, 'bus-stop', 'all_bus_stops.geojson')
+
+WALK_RADIUS = 400  # metres
+WALK_SPEED = 1.2  # m/s
+WALK_DETOUR = 1.3  # streets are rarely straight lines
+BOARDING_PENALTY = 300  # seconds
+# Stops further than this from the route line are treated as bad data
+MAX_STOP_OFFSET = 100  # metres
+# A route's stop_position and a platform with the same name this close are one stop
+PLATFORM_PAIR_RADIUS = 30  # metres
+# Point-segment pairs projected per numpy call in locate_along
+LOCATE_BLOCK = 1 << 20
+DEFAULT_RIDE_SPEED = 18 / 3.6  # m/s, angkot and buses in city traffic
+RIDE_SPEEDS = {
+    'Kereta Api Perkotaan': 45 / 3.6,
+}
+
+def route_origin_name(name):
+    """'Koridor 1: Leuwipanjang → Soreang' -> 'leuwipanjang'."""
+    if '→' not in name:
+        return None
+    origin = name.split('→')[0]
+    return origin.split(':')[-1].strip().lower() or None
+
+def locate_along(chains, points, projection):
+    """Distance along the concatenated chains and distance off the line for each point, in metres.
+
+    All points are projected onto all segments at once, a block of points at a
+    time so the points x segments arrays stay small.
+    """
+    starts = []
+    ends = []
+    for chain in chains:
+        xy = projection.forward(chain)
+        starts.append(xy[:-1])
+        ends.append(xy[1:])
+    starts = np.vstack(starts)
+    ends = np.vstack(ends)
+    d = ends - starts
+    lengths = np.hypot(d[:, 0], d[:, 1])
+    offsets = np.concatenate([[0.0], np.cumsum(lengths)[:-1]])
+    length2 = np.where(lengths == 0, 1, lengths ** 2)
+
+    xy = projection.forward(points)
+    along = np.empty(len(xy))
+    off = np.empty(len(xy))
+    block = max(1, LOCATE_BLOCK // len(starts))
+    for first in range(0, len(xy), block):
+        px = xy[first:first + block, 0:1]
+        py = xy[first:first + block, 1:2]
+        t = np.clip(((px - starts[:, 0]) * d[:, 0] + (py - starts[:, 1]) * d[:, 1]) / length2, 0, 1)
+        distances = np.hypot(starts[:, 0] + t * d[:, 0] - px, starts[:, 1] + t * d[:, 1] - py)
+        nearest = np.argmin(distances, axis=1)
+        rows = np.arange(len(nearest))
+        along[first:first + block] = offsets[nearest] + t[rows, nearest] * lengths[nearest]
+        off[first:first + block] = distances[rows, nearest]
+    return along, off, float(lengths.sum())
+
+def oneway_vote(chains, features, projection):
+    """Metres of one-way street the chains run along forwards minus metres they run against."""
+    ends = []
+    signs = []
+    for feature in features:
+        props = feature.get('properties') or {}
+        oneway = props.get('oneway')
+        if feature['geometry']['type'] != 'LineString' or oneway not in ('yes', '-1'):
+            continue
+        line = feature['geometry']['coordinates']
+        ends += [line[0], line[-1]]
+        signs.append(1 if oneway == 'yes' else -1)
+    if not ends:
+        return 0.0
+    along, _, _ = locate_along(chains, ends, projection)
+    return float(np.dot(along[1::2] - along[0::2], signs))
+
+def is_reversed(route, chains, features, endstops, stops, candidates, projection):
+    """Whether the stitched chains run against the route's direction of travel."""
+    total = locate_along(chains, [chains[0][0]], projection)[2]
+    if len(endstops) >= 2:
+        along, _, _ = locate_along(chains, [endstops[0]['geometry']['coordinates']], projection)
+        return along[0] > total / 2
+    # One-way streets only go one way; routes that use them tell their direction
+    vote = oneway_vote(chains, features, projection)
+    if vote:
+        return vote < 0
+    origin_name = route_origin_name(route['name'])
+    for i in candidates:
+        name = (stops[i]['properties'].get('name') or '').lower()
+        if origin_name and name and (origin_name in name or name in origin_name):
+            along, _, _ = locate_along(chains, [stops[i]['geometry']['coordinates']], projection)
+            return along[0] > total / 2
+    return False
+
+def stop_name(stop):
+    return (stop['properties'].get('name') or '').strip().lower()
+
+def route_stop_sequence(route, files, stops, stop_positions, projection):
+    """Indices into stops in travel order, their chainage and offset from the line, and the route length."""
+    features = []
+    endstops = []
+    for filename, data in files:
+        features.extend(data['features'])
+        if filename == 'endstops.geojson':
+            endstops = [f for f in data['features'] if f['geometry']['type'] == 'Point']
+    chains, gaps = stitch_features(features)
+    candidates = sorted(stop_positions)
+    if not chains or not candidates:
+        return [], [], [], 0.0
+
+    points = [stops[i]['geometry']['coordinates'] for i in candidates]
+    along, off, total = locate_along(chains, points, projection)
+    keep = off <= MAX_STOP_OFFSET
+
+    if is_reversed(route, chains, features, endstops, stops, candidates, projection):
+        along = total - along
+
+    order = []
+    for a, i, o in sorted((along[k], candidates[k], off[k]) for k in range(len(candidates)) if keep[k]):
+        # Two nodes tagged as the same stop right after each other (both sides of a
+        # terminal, a bus_stop on the road next to its platform) are one stop
+        if order and a - order[-1][0] <= PLATFORM_PAIR_RADIUS and stop_name(stops[i]) \
+                and stop_name(stops[i]) == stop_name(stops[order[-1][1]]):
+            continue
+        order.append((a, i, o))
+    return [i for _, i, _ in order], [a for a, _, _ in order], [o for _, _, o in order], total
+
+def load_stops(stops_path=STOPS_PATH):
+    with open(stops_path, 'r', encoding='utf-8') as f:
+        return json.load(f)['features']
+
+def paired_platform(feature, platforms):
+    """The platform a stop_position belongs to: the nearest one with the same name within PLATFORM_PAIR_RADIUS."""
+    name = stop_name(feature)
+    if not name:
+        return None
+    lon, lat = feature['geometry']['coordinates'][:2]
+    for platform, distance in platforms.stops_within(lon, lat, PLATFORM_PAIR_RADIUS):
+        if stop_name(platform) == name:
+            return platform
+    return None
+
+def route_sequences(routes_data, stops, route_data_dir=ROUTE_DATA_DIR):
+    """Ordered stops of every route with route data.
+
+    Returns (stops, stop_index, sequences); stops is extended with the stop
+    positions found only in the route files, and each sequence is (category,
+    route, stop indices, chainage, offsets, route length).
+    """
+    stops = list(stops)
+    stop_index = {stop['properties']['id']: i for i, stop in enumerate(stops)}
+    route_stops = {}
+    for i, stop in enumerate(stops):
+        for relation_id in stop['properties'].get('routes') or []:
+            route_stops.setdefault(int(relation_id), set()).add(i)
+
+    projection = LocalProjection.for_lines([[s['geometry']['coordinates'] for s in stops]])
+    platforms = TransitIndex.from_stops(stops)
+    sequences = []
+    for category, route in iter_routes(routes_data):
+        route_dir = os.path.join(route_data_dir, route['relationId'])
+        if not os.path.exists(route_dir):
+            continue
+        files = load_route_files(route_dir)
+        positions = set(route_stops.get(int(route['relationId']), ()))
+        # Stop positions from the route's own files join the platforms listed in
+        # all_bus_stops, except where they are the road side of one of those platforms
+        for filename, data in files:
+            if filename in ('stops.geojson', 'endstops.geojson'):
+                for feature in data['features']:
+                    if feature['geometry']['type'] != 'Point':
+                        continue
+                    feature = paired_platform(feature, platforms) or feature
+                    stop_id = feature['properties']['id']
+                    if stop_id not in stop_index:
+                        stop_index[stop_id] = len(stops)
+                        stops.append(feature)
+                    positions.add(stop_index[stop_id])
+
+        sequences.append((category, route, *route_stop_sequence(route, files, stops, positions, projection)))
+    return stops, stop_index, sequences
+
+def compile_graph(routes_data, stops, route_data_dir=ROUTE_DATA_DIR):
+    """Build the CSR arrays from routes.json, the stop features and the route GeoJSON."""
+    stops, stop_index, route_stop_sequences = route_sequences(routes_data, stops, route_data_dir)
+    routes = []
+    sequences = []
+    for category, route, sequence, along, offsets, length in route_stop_sequences:
+        if len(sequence) < 2:
+            continue
+        speed = RIDE_SPEEDS.get(category['name'], DEFAULT_RIDE_SPEED)
+        routes.append((int(route['relationId']), route['name'], category['name']))
+        sequences.append((sequence, along, speed))
+
+    sources = []
+    targets = []
+    weights = []
+    node_stop = list(range(len(stops)))
+    node_route = [-1] * len(stops)
+
+    for route_number, (sequence, along, speed) in enumerate(sequences):
+        first = len(node_stop)
+        node_stop.extend(sequence)
+        node_route.extend([route_number] * len(sequence))
+        for k, stop in enumerate(sequence):
+            node = first + k
+            sources += [stop, node]
+            targets += [node, stop]
+            weights += [BOARDING_PENALTY, 0]
+            if k + 1 < len(sequence):
+                sources.append(node)
+                targets.append(node + 1)
+                weights.append(max(along[k + 1] - along[k], 0) / speed)
+
+    index = TransitIndex.from_stops(stops)
+    for i, stop in enumerate(stops):
+        lon, lat = stop['geometry']['coordinates'][:2]
+        for other, distance in index.stops_within(lon, lat, WALK_RADIUS):
+            j = stop_index[other['properties']['id']]
+            if j != i:
+                sources.append(i)
+                targets.append(j)
+                weights.append(distance * WALK_DETOUR / WALK_SPEED)
+
+    sources = np.asarray(sources, dtype=np.int32)
+    order = np.argsort(sources, kind='stable')
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(sources, minlength=len(node_stop)))]).astype(np.int32)
+    return {
+        'indptr': indptr,
+        'indices': np.asarray(targets, dtype=np.int32)[order],
+        'weights': np.asarray(weights, dtype=np.float32)[order],
+        'node_stop': np.asarray(node_stop, dtype=np.int32),
+        'node_route': np.asarray(node_route, dtype=np.int32),
+        'stop_ids': np.asarray([s['properties']['id'] for s in stops], dtype=np.int64),
+        'stop_names': np.asarray([s['properties'].get('name') or '' for s in stops]),
+        'stop_coords': np.asarray([s['geometry']['coordinates'][:2] for s in stops], dtype=np.float64),
+        'route_ids': np.asarray([r[0] for r in routes], dtype=np.int64),
+        'route_names': np.asarray([r[1] for r in routes]),
+        'route_categories': np.asarray([r[2] for r in routes]),
+    }
+
+def save_graph(graph, path=GRAPH_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **graph)
+
+class JourneyPlanner:
+    """Shortest-time journeys over a compiled graph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.indptr = graph['indptr']
+        self.indices = graph['indices']
+        self.weights = graph['weights']
+        self.node_stop = graph['node_stop']
+        self.node_route = graph['node_route']
+        self.stop_ids = graph['stop_ids']
+        self.stop_count = len(self.stop_ids)
+        self.stop_by_id = {int(stop_id): i for i, stop_id in enumerate(self.stop_ids)}
+        self.projection = LocalProjection(float(graph['stop_coords'][:, 1].mean()) if self.stop_count else 0.0)
+        self.stop_xy = self.projection.forward(graph['stop_coords']) if self.stop_count else np.empty((0, 2))
+
+    @classmethod
+    def load(cls, path=GRAPH_PATH):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    def walkable_stops(self, lon, lat, radius=WALK_RADIUS):
+        """{stop index: walking seconds} for the stops around a point."""
+        x, y = self.projection.forward([[lon, lat]])[0]
+        distances = np.hypot(self.stop_xy[:, 0] - x, self.stop_xy[:, 1] - y)
+        near = np.flatnonzero(distances <= radius)
+        return {int(i): float(distances[i]) * WALK_DETOUR / WALK_SPEED for i in near}
+
+    def endpoints(self, place):
+        """A stop id or a (lon, lat) pair -> {stop index: seconds to get there}."""
+        if isinstance(place, (tuple, list)):
+            return self.walkable_stops(*place)
+        if int(place) not in self.stop_by_id:
+            raise KeyError(f"Unknown stop id: {place}")
+        return {self.stop_by_id[int(place)]: 0.0}
+
+    def plan(self, origin, destination):
+        """Fastest journey between two stop ids or (lon, lat) pairs, or None."""
+        sources = self.endpoints(origin)
+        targets = self.endpoints(destination)
+        if not sources or not targets:
+            return None
+
+        dist = {}
+        previous = {}
+        heap = [(seconds, node, -1) for node, seconds in sources.items()]
+        heapq.heapify(heap)
+        best = (float('inf'), None)
+        while heap:
+            d, node, parent = heapq.heappop(heap)
+            if node in dist:
+                continue
+            if d >= best[0]:
+                break
+            dist[node] = d
+            previous[node] = parent
+            if node in targets and d + targets[node] < best[0]:
+                best = (d + targets[node], node)
+            for k in range(self.indptr[node], self.indptr[node + 1]):
+                neighbour = int(self.indices[k])
+                if neighbour not in dist:
+                    heapq.heappush(heap, (d + float(self.weights[k]), neighbour, node))
+
+        if best[1] is None:
+            return None
+        path = []
+        node = best[1]
+        while node != -1:
+            path.append(node)
+            node = previous[node]
+        path.reverse()
+        return {
+            'duration_s': round(best[0]),
+            'access_s': round(sources[path[0]]),
+            'egress_s': round(targets[path[-1]]),
+            'legs': self.legs(path, dist),
+        }
+
+    def stop_info(self, stop):
+        return {
+            'id': int(self.stop_ids[stop]),
+            'name': str(self.graph['stop_names'][stop]),
+            'coordinates': [float(c) for c in self.graph['stop_coords'][stop]],
+        }
+
+    def legs(self, path, dist):
+        legs = []
+        for a, b in zip(path, path[1:]):
+            route_a, route_b = self.node_route[a], self.node_route[b]
+            if route_a < 0 and route_b < 0:
+                legs.append({'mode': 'walk', 'from': self.stop_info(a), 'to': self.stop_info(b),
+                             'duration_s': round(dist[b] - dist[a])})
+            elif route_a < 0:
+                legs.append({'mode': 'ride', 'route': {
+                    'relationId': int(self.graph['route_ids'][route_b]),
+                    'name': str(self.graph['route_names'][route_b]),
+                    'category': str(self.graph['route_categories'][route_b]),
+                }, 'from': self.stop_info(int(self.node_stop[b])), 'stops': 0,
+                    # Boarding costs BOARDING_PENALTY, the expected wait for the vehicle
+                    'wait_s': round(dist[b] - dist[a]), 'start_s': dist[b]})
+            elif route_b >= 0:
+                legs[-1]['stops'] += 1
+            else:
+                leg = legs[-1]
+                leg['to'] = self.stop_info(int(self.node_stop[a]))
+                leg['duration_s'] = round(dist[a] - leg.pop('start_s'))
+        return legs
@@ -0,0 +1,156 @@
+"""Refresh only the routes whose OSM data changed since the last run.
+
+One diff query lists the relations in routes.json that changed after the
+timestamp in route-data/osm-state.json: the relation itself, any of its ways
+(tags, node list or a moved node) or any of its member nodes. Only those, plus
+routes that have no files yet, are downloaded again, with the same queries and
+file layout as update-routes.js. These queries skip the Overpass response
+cache, so what is written matches the osm_base that gets recorded.
+
+The full download (node action-scripts/update-routes.js) stays the fallback:
+without a stored timestamp this script exits with status 2. Run it with
+--baseline right before a full download to record the time the full data is
+current from.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from osm_state import current_osm_base, get_timestamp, save_timestamp
+from overpass import ElementParser
+from overpass_async import AsyncOverpassClient
+from overpass_cache import OverpassCache
+from route_pipeline import ROUTE_DATA_DIR, iter_routes, load_routes
+
+DATASET = 'routes'
+
+def changed_routes_query(relation_ids, since):
+    ids = ','.join(relation_ids)
+    return f"""
+    [out:json][timeout:180];
+    rel(id:{ids})->.routes;
+    way(r.routes)->.ways;
+    node(w.ways)(newer:"{since}")->.moved;
+    node(r.routes)(newer:"{since}")->.members;
+    (
+      way.ways(newer:"{since}");
+      way.ways(bn.moved);
+    )->.changed;
+    (
+      rel.routes(newer:"{since}");
+      rel.routes(bw.changed);
+      rel.routes(bn.members);
+    );
+    out ids;
+    """
+
+# The same queries update-routes.js sends
+def ways_query(relation_id):
+    return f"[out:json]; relation({relation_id}); way(r); out geom;"
+
+def stops_query(relation_id, route_type):
+    if route_type == 'ways_with_points':
+        return (f'[out:json];relation({relation_id});node(r:"stop");out geom;'
+                f'relation({relation_id});node(r:"stop_entry_only");out geom;'
+                f'relation({relation_id});node(r:"stop_exit_only");out geom;')
+    return (f'[out:json];relation({relation_id});node(r:"stop_entry_only");out geom;'
+            f'relation({relation_id});node(r:"stop_exit_only");out geom;')
+
+def stops_filename(route_type):
+    return 'stops.geojson' if route_type == 'ways_with_points' else 'endstops.geojson'
+
+def ways_geojson(elements):
+    return {'type': 'FeatureCollection', 'features': [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'LineString', 'coordinates': [[c['lon'], c['lat']] for c in way['geometry']]},
+            'properties': {'id': way['id'], **way.get('tags', {})},
+        }
+        for way in elements if way['type'] == 'way'
+    ]}
+
+def nodes_geojson(elements):
+    return {'type': 'FeatureCollection', 'features': [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [node['lon'], node['lat']]},
+            'properties': {'id': node['id'], **node.get('tags', {})},
+        }
+        for node in elements if node['type'] == 'node'
+    ]}
+
+def write_route_file(path, data):
+    # Byte for byte what update-routes.js writes with JSON.stringify(data, null, 2)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, indent=2, ensure_ascii=False))
+
+def unique_routes(routes_data):
+    routes = {}
+    for category, route in iter_routes(routes_data):
+        routes.setdefault(str(route['relationId']), route['type'])
+    return routes
+
+def missing_routes(routes, route_data_dir):
+    return [
+        relation_id for relation_id, route_type in routes.items()
+        if not os.path.exists(os.path.join(route_data_dir, relation_id, 'ways.geojson'))
+        or not os.path.exists(os.path.join(route_data_dir, relation_id, stops_filename(route_type)))
+    ]
+
+async def fetch_changed(client, relation_ids, since):
+    parser = ElementParser()
+    elements = [e async for e in client.iter_elements(changed_routes_query(relation_ids, since), parser)]
+    if parser.osm_base is None:
+        raise ValueError("Overpass response has no timestamp_osm_base")
+    return sorted({str(e['id']) for e in elements if e['type'] == 'relation'}, key=int), parser.osm_base
+
+async def refresh_routes(client, routes, relation_ids, route_data_dir):
+    queries = []
+    for relation_id in relation_ids:
+        queries.extend([ways_query(relation_id), stops_query(relation_id, routes[relation_id])])
+    results = await client.fetch_many(queries)
+    for i, relation_id in enumerate(relation_ids):
+        ways, stops = results[2 * i], results[2 * i + 1]
+        route_dir = os.path.join(route_data_dir, relation_id)
+        os.makedirs(route_dir, exist_ok=True)
+        write_route_file(os.path.join(route_dir, 'ways.geojson'), ways_geojson(ways))
+        write_route_file(os.path.join(route_dir, stops_filename(routes[relation_id])), nodes_geojson(stops))
+        print(f"Refreshed route {relation_id}")
+
+async def run_delta(since, route_data_dir=ROUTE_DATA_DIR):
+    routes = unique_routes(load_routes())
+    # No cache: a cached response from earlier in the day would be written out
+    # as current and then recorded under the new osm_base
+    async with AsyncOverpassClient(cache=OverpassCache(mode='off')) as client:
+        changed, osm_base = await fetch_changed(client, list(routes), since)
+        missing = missing_routes(routes, route_data_dir)
+        pending = sorted(set(changed) | set(missing), key=int)
+        print(f"Changed since {since}: {len(changed)} routes; without files: {len(missing)}")
+        await refresh_routes(client, routes, pending, route_data_dir)
+    return osm_base, len(pending)
+
+def main():
+    parser = argparse.ArgumentParser(description="Download only the routes whose OSM data changed since the last run")
+    parser.add_argument('--since', help="OSM timestamp to diff against (default: the one in osm-state.json)")
+    parser.add_argument('--baseline', action='store_true',
+                        help="only record the current OSM timestamp, before a full update-routes.js run")
+    args = parser.parse_args()
+
+    if args.baseline:
+        osm_base = current_osm_base()
+        save_timestamp(DATASET, osm_base)
+        print(f"Recorded OSM timestamp {osm_base} for a full refresh")
+        return
+
+    since = args.since or get_timestamp(DATASET)
+    if not since:
+        print("No previous OSM timestamp recorded; run the full refresh (update-routes.js) instead")
+        sys.exit(2)
+
+    osm_base, refreshed = asyncio.run(run_delta(since))
+    save_timestamp(DATASET, osm_base)
+    print(f"Refreshed {refreshed} routes; data current as of {osm_base}")
+
+if __name__ == '__main__':
+    main()
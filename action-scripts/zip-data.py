@@ -0,0 +1,222 @@
+"""Package the download bundles (route-data/tfb-route-*.zip) reproducibly.
+
+Unlike `zip -r`, the same input always gives the same archive bytes: entries
+are sorted, every entry gets the same fixed timestamp and permissions, and
+nothing about the machine or checkout ends up in the file. So an unchanged
+tree produces no diff and no commit.
+
+Members whose size and CRC-32 match an entry of the previous archive are
+copied over as already-compressed bytes instead of being compressed again.
+The previous archive records its compression level in the zip comment; with
+a different --level everything is recompressed. Files are streamed from disk
+in chunks, without staging copies.
+
+  python action-scripts/zip-data.py                # every bundle, level 6
+  python action-scripts/zip-data.py --level 9 tfb-route-kml.zip
+"""
+import argparse
+import os
+import struct
+import time
+import zipfile
+import zlib
+from route_pipeline import DATA_DIR
+
+BUNDLES = {
+    'tfb-route-shp.zip': 'shp-named-ungrouped',
+    'tfb-route-kml.zip': 'kml-named',
+}
+CHUNK_SIZE = 1024 * 1024
+# 1980-01-01 00:00, the earliest DOS timestamp
+DOS_TIME, DOS_DATE = 0, (0 << 9) | (1 << 5) | 1
+UNIX_FILE_MODE = 0o100644
+UTF8_FLAG = 0x800
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')
+CENTRAL_HEADER = struct.Struct('<4s4B4H3L5H2L')
+END_RECORD = struct.Struct('<4s4H2LH')
+
+def list_members(source_dir):
+    """(archive name, path) for every file under source_dir, sorted by archive name."""
+    members = []
+    for root, dirs, files in os.walk(source_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            members.append((os.path.relpath(path, source_dir).replace(os.sep, '/'), path))
+    return sorted(members)
+
+def file_crc(path):
+    crc = size = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+    return crc, size
+
+def archive_comment(level):
+    return f"level={level}".encode('ascii')
+
+class PreviousArchive:
+    """Read access to the raw compressed members of the archive being replaced."""
+
+    def __init__(self, path, level):
+        self.entries = {}
+        self.f = None
+        if not os.path.exists(path):
+            return
+        try:
+            archive = zipfile.ZipFile(path)
+        except zipfile.BadZipFile:
+            return
+        with archive:
+            # Raw bytes are only interchangeable if they were compressed the same way
+            if archive.comment != archive_comment(level):
+                return
+            self.entries = {info.filename: info for info in archive.infolist()}
+        self.f = open(path, 'rb')
+
+    def find(self, name, crc, size):
+        info = self.entries.get(name)
+        if info is None or info.CRC != crc or info.file_size != size:
+            return None
+        return info
+
+    def copy_raw(self, info, out):
+        self.f.seek(info.header_offset)
+        header = LOCAL_HEADER.unpack(self.f.read(LOCAL_HEADER.size))
+        self.f.seek(header[-2] + header[-1], os.SEEK_CUR)
+        remaining = info.compress_size
+        while remaining:
+            chunk = self.f.read(min(CHUNK_SIZE, remaining))
+            out.write(chunk)
+            remaining -= len(chunk)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+class ZipBuilder:
+    """Minimal ZIP writer: deflate or stored members, fixed metadata, no zip64."""
+
+    def __init__(self, f, level):
+        self.f = f
+        self.level = level
+        self.method = zipfile.ZIP_DEFLATED if level > 0 else zipfile.ZIP_STORED
+        self.central = []
+
+    def local_header(self, name, flags, method, crc, compress_size, size):
+        return LOCAL_HEADER.pack(b'PK\x03\x04', 20, flags, method, DOS_TIME, DOS_DATE,
+                                 crc, compress_size, size, len(name), 0) + name
+
+    def start_member(self, name):
+        encoded = name.encode('utf-8')
+        flags = 0 if encoded.isascii() else UTF8_FLAG
+        return encoded, flags, self.f.tell()
+
+    def finish_member(self, encoded, flags, offset, method, crc, compress_size, size):
+        if max(compress_size, size, offset) >= 0xffffffff:
+            raise ValueError(f"{encoded.decode('utf-8')} needs zip64, which this writer doesn't support")
+        self.central.append((encoded, flags, offset, method, crc, compress_size, size))
+
+    def add_file(self, name, path):
+        """Compress path into the archive, streaming it in chunks."""
+        encoded, flags, offset = self.start_member(name)
+        # Sizes and CRC aren't known yet; the header is patched once the data is written
+        self.f.write(self.local_header(encoded, flags, self.method, 0, 0, 0))
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15) if self.method == zipfile.ZIP_DEFLATED else None
+        crc = size = compress_size = 0
+        with open(path, 'rb') as src:
+            while chunk := src.read(CHUNK_SIZE):
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                self.f.write(chunk)
+                compress_size += len(chunk)
+        if compressor:
+            tail = compressor.flush()
+            self.f.write(tail)
+            compress_size += len(tail)
+
+        end = self.f.tell()
+        self.f.seek(offset)
+        self.f.write(self.local_header(encoded, flags, self.method, crc, compress_size, size))
+        self.f.seek(end)
+        self.finish_member(encoded, flags, offset, self.method, crc, compress_size, size)
+
+    def add_raw(self, name, info, previous):
+        """Copy an unchanged member's compressed bytes from the previous archive."""
+        encoded, flags, offset = self.start_member(name)
+        self.f.write(self.local_header(encoded, flags, info.compress_type, info.CRC, info.compress_size, info.file_size))
+        previous.copy_raw(info, self.f)
+        self.finish_member(encoded, flags, offset, info.compress_type, info.CRC, info.compress_size, info.file_size)
+
+    def close(self):
+        start = self.f.tell()
+        for encoded, flags, offset, method, crc, compress_size, size in self.central:
+            self.f.write(CENTRAL_HEADER.pack(b'PK\x01\x02', 20, 3, 20, 0, flags, method, DOS_TIME, DOS_DATE,
+                                             crc, compress_size, size, len(encoded), 0, 0, 0, 0,
+                                             UNIX_FILE_MODE << 16, offset))
+            self.f.write(encoded)
+        comment = archive_comment(self.level)
+        self.f.write(END_RECORD.pack(b'PK\x05\x06', 0, 0, len(self.central), len(self.central),
+                                     self.f.tell() - start, start, len(comment)) + comment)
+
+def build_bundle(source_dir, zip_path, level=6):
+    """Write zip_path from source_dir; returns (members, reused, changed)."""
+    previous = PreviousArchive(zip_path, level)
+    tmp_path = f"{zip_path}.tmp"
+    reused = 0
+    members = list_members(source_dir)
+    try:
+        with open(tmp_path, 'wb') as f:
+            builder = ZipBuilder(f, level)
+            for name, path in members:
+                info = previous.find(name, *file_crc(path)) if previous.entries else None
+                if info is not None:
+                    builder.add_raw(name, info, previous)
+                    reused += 1
+                else:
+                    builder.add_file(name, path)
+            builder.close()
+    finally:
+        previous.close()
+
+    changed = not os.path.exists(zip_path) or not same_contents(zip_path, tmp_path)
+    if changed:
+        os.replace(tmp_path, zip_path)
+    else:
+        # Leave the old file alone so its mtime doesn't move either
+        os.remove(tmp_path)
+    return len(members), reused, changed
+
+def same_contents(a, b):
+    if os.path.getsize(a) != os.path.getsize(b):
+        return False
+    with open(a, 'rb') as fa, open(b, 'rb') as fb:
+        while True:
+            chunk = fa.read(CHUNK_SIZE)
+            if chunk != fb.read(CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the route-data download ZIPs reproducibly")
+    parser.add_argument('bundles', nargs='*', default=list(BUNDLES),
+                        help=f"bundles to build (default: {' '.join(BUNDLES)})")
+    parser.add_argument('--level', type=int, default=6, choices=range(10),
+                        help="deflate level, 0 stores without compressing (default: 6, like zip)")
+    args = parser.parse_args()
+
+    for bundle in args.bundles:
+        if bundle not in BUNDLES:
+            parser.error(f"unknown bundle {bundle}, expected one of: {', '.join(BUNDLES)}")
+        start_time = time.time()
+        zip_path = os.path.join(DATA_DIR, bundle)
+        members, reused, changed = build_bundle(os.path.join(DATA_DIR, BUNDLES[bundle]), zip_path, args.level)
+        status = "updated" if changed else "unchanged"
+        print(f"{bundle}: {members} files, {reused} reused, {status} "
+              f"({os.path.getsize(zip_path) / 1024:.0f} KB, {time.time() - start_time:.1f} s)")
+
+if __name__ == '__main__':
+    main()
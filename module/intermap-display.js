@@ -11,6 +11,11 @@ const config = {
   ...(window.routeConfig || {}) // Merge with user-provided config
 };
 
+// Packed geometries built by action-scripts/pack-routes.py, next to the GeoJSON folder
+if (!config.packedRoutePath) {
+  config.packedRoutePath = config.localRouteBasePath.replace(/geojson\/?$/, 'geometry-pack');
+}
+
 // Route name lookup
 let routeNameLookup = {};
 
@@ -28,55 +33,183 @@ async function loadRouteNameLookup() {
   }
 }
 
+// Packed route functions
+// index.json format this code reads: [offset, length, CRC-32] entries and a routes.bin hash
+const PACK_FORMAT = 2;
+let packIndexPromise = null;
+// Set once the index turns out to be in another format; routes then load as GeoJSON
+let packUnsupported = false;
+
+function loadPackIndex() {
+  if (!packIndexPromise) {
+    // Always revalidate: the offsets must come from the same build as routes.bin
+    packIndexPromise = fetch(`${config.packedRoutePath}/index.json`, { cache: 'no-cache' }).then(response => {
+      if (!response.ok) throw new Error('Route pack index not found');
+      return response.json();
+    }).then(index => {
+      // Any other format can't be checked against routes.bin, so don't use the pack at all
+      if (index.format !== PACK_FORMAT) {
+        packUnsupported = true;
+        throw new Error(`Unsupported route pack format ${index.format}`);
+      }
+      return index;
+    });
+    // Let a later call retry if the index couldn't be loaded
+    packIndexPromise.catch(() => { packIndexPromise = null; });
+  }
+  return packIndexPromise;
+}
+
+// CRC-32 (the zlib one) of a route block, to check it against index.json
+let crcTable = null;
+
+function crc32(bytes) {
+  if (!crcTable) {
+    crcTable = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+      let c = n;
+      for (let k = 0; k < 8; k++) c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+      crcTable[n] = c;
+    }
+  }
+  let crc = 0xffffffff;
+  for (let i = 0; i < bytes.length; i++) crc = crcTable[(crc ^ bytes[i]) & 0xff] ^ (crc >>> 8);
+  return (crc ^ 0xffffffff) >>> 0;
+}
+
+// Decode one route block: LEB128 varints, points as zigzag deltas of lon/lat * scale
+function decodePackedRoute(bytes, scale) {
+  const textDecoder = new TextDecoder();
+  let pos = 0;
+  let lon = 0;
+  let lat = 0;
+
+  const varint = () => {
+    let value = 0;
+    let factor = 1;
+    let byte;
+    do {
+      byte = bytes[pos++];
+      value += (byte & 0x7f) * factor;
+      factor *= 128;
+    } while (byte >= 0x80);
+    return value;
+  };
+  const delta = () => {
+    const value = varint();
+    return value % 2 === 0 ? value / 2 : -(value + 1) / 2;
+  };
+  const point = () => {
+    lon += delta();
+    lat += delta();
+    return [lat / scale, lon / scale];
+  };
+  const stopList = () => {
+    const stops = [];
+    const count = varint();
+    for (let i = 0; i < count; i++) {
+      const latLng = point();
+      const length = varint();
+      const name = textDecoder.decode(bytes.subarray(pos, pos + length));
+      pos += length;
+      stops.push({ latLng, name: name || null });
+    }
+    return stops;
+  };
+
+  const ways = [];
+  const wayCount = varint();
+  for (let i = 0; i < wayCount; i++) {
+    const pointCount = varint();
+    const latLngs = new Array(pointCount);
+    for (let j = 0; j < pointCount; j++) latLngs[j] = point();
+    ways.push(latLngs);
+  }
+  const stops = stopList();
+  const endstops = stopList();
+  return { ways, stops, endstops };
+}
+
+async function fetchPackedRoute(relationId) {
+  const index = await loadPackIndex();
+  const entry = index.routes[relationId];
+  if (!entry) throw new Error('Route not in pack');
+
+  const [offset, length, checksum] = entry;
+  // The hash keeps a cached routes.bin from an older build from being used with this index
+  const response = await fetch(`${config.packedRoutePath}/routes.bin?v=${index.hash}`, {
+    headers: { Range: `bytes=${offset}-${offset + length - 1}` }
+  });
+  if (!response.ok) throw new Error('Route pack not found');
+
+  let bytes = new Uint8Array(await response.arrayBuffer());
+  // Server ignored the Range header and sent the whole pack
+  if (response.status !== 206) bytes = bytes.subarray(offset, offset + length);
+  // A pack from another build than the index: the caller falls back to GeoJSON
+  if (bytes.length !== length || crc32(bytes) !== checksum) throw new Error('Route pack does not match its index');
+  return decodePackedRoute(bytes, index.scale);
+}
+
+function buildRouteLayer(routeName, ways, stops, routeColor) {
+  const layerGroup = L.layerGroup();
+
+  ways.forEach(latLngs => {
+    L.polyline(latLngs, {
+      color: routeColor,
+      weight: 4
+    }).bindPopup(routeName).addTo(layerGroup);
+  });
+
+  stops.forEach(stop => {
+    L.circleMarker(stop.latLng, {
+      radius: 5,
+      color: routeColor,
+      fillColor: "#ffffff",
+      fillOpacity: 1
+    }).bindPopup(stop.name || "Unnamed Stop")
+      .addTo(layerGroup);
+  });
+
+  return layerGroup;
+}
+
 // route-map.js functions
 async function fetchLocalRoute(relationId, displayType, routeColor) {
   await loadRouteNameLookup();
+  const routeName = routeNameLookup[relationId.toString()];
 
-  return new Promise((resolve, reject) => {
-    const layerGroup = L.layerGroup();
-    const basePath = `${config.localRouteBasePath}/${relationId}`;
-
-    Promise.all([
-      fetch(`${basePath}/ways.geojson`),
-      fetch(`${basePath}/${displayType === "ways_with_points" ? "stops" : "endstops"}.geojson`)
-    ]).then(async ([waysResponse, stopsResponse]) => {
-      if (!waysResponse.ok || !stopsResponse.ok) throw new Error('Local files not found');
-
-      const [waysData, stopsData] = await Promise.all([
-        waysResponse.json(),
-        stopsResponse.json()
-      ]);
-
-      // Ensure routeNameLookup is loaded or load its Id
-      const routeName = routeNameLookup[relationId.toString()]
-
-      // Load ways data
-      waysData.features.forEach(feature => {
-        if (feature.geometry.type === "LineString") {
-          L.polyline(feature.geometry.coordinates.map(coord => [coord[1], coord[0]]), {
-            color: routeColor,
-            weight: 4
-          }).bindPopup(routeName).addTo(layerGroup);
-        }
-      });
-
-      // Load stops data
-      stopsData.features.forEach(feature => {
-        if (feature.geometry.type === "Point") {
-          const coords = feature.geometry.coordinates;
-          L.circleMarker([coords[1], coords[0]], {
-            radius: 5,
-            color: routeColor,
-            fillColor: "#ffffff",
-            fillOpacity: 1
-          }).bindPopup(feature.properties?.name || "Unnamed Stop")
-            .addTo(layerGroup);
-        }
-      });
+  if (!packUnsupported) {
+    try {
+      const route = await fetchPackedRoute(relationId);
+      const stops = displayType === "ways_with_points" ? route.stops : route.endstops;
+      return buildRouteLayer(routeName, route.ways, stops, routeColor);
+    } catch (packError) {
+      console.warn(`Packed data unavailable for ${relationId}, loading GeoJSON:`, packError);
+    }
+  }
 
-      resolve(layerGroup);
-    }).catch(reject);
-  });
+  const basePath = `${config.localRouteBasePath}/${relationId}`;
+  const [waysResponse, stopsResponse] = await Promise.all([
+    fetch(`${basePath}/ways.geojson`),
+    fetch(`${basePath}/${displayType === "ways_with_points" ? "stops" : "endstops"}.geojson`)
+  ]);
+  if (!waysResponse.ok || !stopsResponse.ok) throw new Error('Local files not found');
+
+  const [waysData, stopsData] = await Promise.all([
+    waysResponse.json(),
+    stopsResponse.json()
+  ]);
+
+  const ways = waysData.features
+    .filter(feature => feature.geometry.type === "LineString")
+    .map(feature => feature.geometry.coordinates.map(coord => [coord[1], coord[0]]));
+  const stops = stopsData.features
+    .filter(feature => feature.geometry.type === "Point")
+    .map(feature => ({
+      latLng: [feature.geometry.coordinates[1], feature.geometry.coordinates[0]],
+      name: feature.properties?.name
+    }));
+  return buildRouteLayer(routeName, ways, stops, routeColor);
 }
 
 // Overpass API functions if local data is not available